@@ -0,0 +1,174 @@
+"""
+Benchmark of `.boostignore` file discovery on a synthetic checkout.
+
+Builds a temporary tree shaped like this repository (terraform providers,
+modules, test data, vendored dependencies) and times discovery two ways: a
+full `os.walk` testing every file and each of its directories against every
+pattern, as a per-pattern matcher does, and `boostignore.walk`, which prunes
+ignored directories and tests paths against the compiled patterns.  Both must
+find the same files.
+
+    python benchmarks/bench_boostignore.py                   # ~100k files
+    python benchmarks/bench_boostignore.py --scale 10        # ~1M files
+    python benchmarks/bench_boostignore.py --output new.json
+    python benchmarks/bench_boostignore.py --baseline old.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from boost.core.boostignore import IgnoreMatcher, _translate, walk
+
+Result = dict[str, Any]
+
+FILES_PER_MODULE = 20
+
+IGNORE = """\
+test_data/
+terraform/azure/
+terraform/gcp/
+terraform/aws/resources
+*.log
+**/node_modules/
+vendor/
+!vendor/keep.tf
+""" + "".join(f"terraform/aws/module-{i}/main.tf\n" for i in range(0, 400, 3))
+
+
+def build(root: Path, files: int) -> None:
+    layout = [
+        "terraform/aws",
+        "terraform/aws/resources",
+        "terraform/azure",
+        "terraform/gcp",
+        "test_data",
+        "services/api/node_modules",
+        "vendor",
+        "src",
+    ]
+    modules = max(1, files // (FILES_PER_MODULE * len(layout)))
+
+    for top in layout:
+        for module in range(modules):
+            directory = root / top / f"module-{module}"
+            directory.mkdir(parents=True)
+            for index in range(FILES_PER_MODULE):
+                suffix = ".log" if index == 0 else ".tf"
+                name = "main.tf" if index == 1 else f"file-{index}{suffix}"
+                (directory / name).touch()
+
+    (root / ".boostignore").write_text(IGNORE)
+
+
+def naive(root: Path) -> Iterator[str]:
+    # One regex per pattern, checked against the file and all its parents.
+    rules = []
+    for line in IGNORE.splitlines():
+        negated = line.startswith("!")
+        line = line.lstrip("!")
+        directory = line.endswith("/")
+        text = line.rstrip("/")
+        prefix = "" if "/" in text else "(?:.*/)?"
+        rules.append((negated, directory, re.compile(prefix + _translate(text) + r"\Z")))
+
+    def ignored(path: str, is_dir: bool) -> bool:
+        result = False
+        for negated, directory, regex in rules:
+            if (is_dir or not directory) and regex.match(path):
+                result = not negated
+        return result
+
+    for current, _, names in os.walk(root):
+        relative = os.path.relpath(current, root).replace(os.sep, "/")
+        parts = [] if relative == "." else relative.split("/")
+        parents = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+        for name in names:
+            path = "/".join((*parts, name))
+            if any(ignored(parent, True) for parent in parents):
+                continue
+            if not ignored(path, False):
+                yield path
+
+
+def timed(run: Any) -> Result:
+    started = time.perf_counter()
+    found = sorted(run())
+    return {"seconds": time.perf_counter() - started, "files": len(found), "paths": found}
+
+
+def regressions(results: Result, baseline: Result, tolerance: float) -> list[str]:
+    failures = []
+
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["seconds"] > reference["seconds"] * (1 + tolerance):
+            failures.append(
+                f"{name}: {result['seconds']:.4g}s exceeds baseline "
+                f"{reference['seconds']:.4g}s (+{tolerance:.0%})"
+            )
+
+    return failures
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    options = parser.parse_args(argv)
+
+    root = Path(tempfile.mkdtemp(prefix="bench-boostignore-"))
+
+    try:
+        build(root, int(100_000 * options.scale))
+        total = sum(len(names) for _, _, names in os.walk(root))
+        results = {
+            "naive": timed(lambda: naive(root)),
+            "compiled": timed(lambda: walk(root, IgnoreMatcher.load(root / ".boostignore"))),
+        }
+    finally:
+        shutil.rmtree(root)
+
+    if results["naive"].pop("paths") != results["compiled"].pop("paths"):
+        print("compiled matcher and naive matcher disagree", file=sys.stderr)
+        return 1
+
+    report = {
+        "python": sys.version.split()[0],
+        "scale": options.scale,
+        "tree_files": total,
+        "speedup": results["naive"]["seconds"] / results["compiled"]["seconds"],
+        "results": results,
+    }
+    encoded = json.dumps(report, indent=2)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)["results"]
+
+        failures = regressions(results, baseline, options.tolerance)
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+Benchmarks for the `boost.core.subprocess` execution layer.
+
+Every scenario runs in a fresh interpreter so peak RSS is attributable to it,
+and results are printed as JSON.  Runs are local only: the child processes are
+`python -c` snippets generating synthetic output.
+
+    python benchmarks/bench_subprocess.py                      # all scenarios
+    python benchmarks/bench_subprocess.py short_lines spawn    # a subset
+    python benchmarks/bench_subprocess.py --scale 4 --output new.json
+    python benchmarks/bench_subprocess.py --baseline old.json --tolerance 0.15
+
+With --baseline the run exits non-zero when a scenario is slower than the
+stored result by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from boost.core.globals import BOOST_EXEC_SUBPROCESS_BUFFER
+from boost.core.subprocess import execute, output
+
+Result = dict[str, Any]
+Scenario = Callable[[float], Awaitable[Result]]
+
+MB = 1024 * 1024
+
+SCENARIOS: dict[str, Scenario] = {}
+
+
+def scenario(name: str) -> Callable[[Scenario], Scenario]:
+    def register(function: Scenario) -> Scenario:
+        SCENARIOS[name] = function
+        return function
+
+    return register
+
+
+def emit(stdout: int, stderr: int = 0, line: int = 80) -> tuple[str, ...]:
+    # A child writing `stdout`/`stderr` bytes of `line`-sized lines.
+    script = (
+        "import sys\n"
+        f"line = b'x' * {line - 1} + b'\\n'\n"
+        f"block = line * max(1, {256 * 1024} // len(line))\n"
+        "for stream, total in ((sys.stdout, %d), (sys.stderr, %d)):\n"
+        "    while total > 0:\n"
+        "        chunk = block[:total]\n"
+        "        stream.buffer.write(chunk)\n"
+        "        total -= len(chunk)\n"
+    ) % (stdout, stderr)
+    return sys.executable, "-c", script
+
+
+def percentiles(samples: list[float]) -> Result:
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50": quantiles[49],
+        "p90": quantiles[89],
+        "p99": quantiles[98],
+        "max": max(samples),
+    }
+
+
+async def timed(runs: int, run: Callable[[], Awaitable[Any]]) -> Result:
+    samples = []
+    started = time.perf_counter()
+
+    for _ in range(runs):
+        begin = time.perf_counter()
+        await run()
+        samples.append(time.perf_counter() - begin)
+
+    seconds = time.perf_counter() - started
+    return {"runs": runs, "seconds": seconds, "latency": percentiles(samples)}
+
+
+async def throughput(size: int, run: Callable[[], Awaitable[Any]]) -> Result:
+    result = await timed(3, run)
+    result["bytes"] = size
+    result["mb_per_second"] = 3 * size / MB / result["seconds"]
+    return result
+
+
+@scenario("spawn")
+async def spawn(scale: float) -> Result:
+    return await timed(
+        max(10, int(200 * scale)),
+        lambda: execute(sys.executable, "-S", "-c", "pass", verbose=False),
+    )
+
+
+@scenario("spawn_posix")
+async def spawn_posix(scale: float) -> Result:
+    return await timed(
+        max(10, int(200 * scale)),
+        lambda: execute(
+            sys.executable, "-S", "-c", "pass", verbose=False, spawn="posix_spawn"
+        ),
+    )
+
+
+async def spawn_from_large_parent(scale: float, backend: str) -> Result:
+    # Page-table copying grows with the parent's resident memory.
+    ballast = bytearray(int(1024 * MB * scale))
+    ballast[::4096] = b"x" * len(ballast[::4096])
+    result = await timed(
+        max(10, int(200 * scale)),
+        lambda: execute("true", verbose=False, spawn=backend),
+    )
+    result["parent_rss"] = len(ballast)
+    return result
+
+
+@scenario("spawn_large_parent")
+async def spawn_large_parent(scale: float) -> Result:
+    return await spawn_from_large_parent(scale, "asyncio")
+
+
+@scenario("spawn_posix_large_parent")
+async def spawn_posix_large_parent(scale: float) -> Result:
+    return await spawn_from_large_parent(scale, "posix_spawn")
+
+
+@scenario("short_lines")
+async def short_lines(scale: float) -> Result:
+    size = int(256 * MB * scale)
+    return await throughput(size, lambda: output(*emit(size), verbose=False))
+
+
+@scenario("short_lines_bytes")
+async def short_lines_bytes(scale: float) -> Result:
+    size = int(256 * MB * scale)
+    return await throughput(
+        size, lambda: output(*emit(size), mode="lines", verbose=False)
+    )
+
+
+@scenario("long_lines")
+async def long_lines(scale: float) -> Result:
+    line = BOOST_EXEC_SUBPROCESS_BUFFER - 1
+    size = line * max(4, int(64 * scale))
+    return await throughput(
+        size, lambda: output(*emit(size, line=line), verbose=False)
+    )
+
+
+@scenario("stdin")
+async def stdin(scale: float) -> Result:
+    count = int(500_000 * scale)
+    paths = [f"terraform/aws/resources/file-{i}.tf\n" for i in range(count)]
+    consume = "import sys\nfor _ in sys.stdin.buffer: pass"
+    result = await throughput(
+        sum(map(len, paths)),
+        lambda: execute(sys.executable, "-c", consume, stdin_iter=paths),
+    )
+    result["lines"] = count
+    return result
+
+
+@scenario("verbose")
+async def verbose(scale: float) -> Result:
+    size = int(64 * MB * scale)
+    logger = logging.getLogger("boost.command.stdout")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return await throughput(size, lambda: output(*emit(size), verbose=True))
+
+
+@scenario("non_verbose")
+async def non_verbose(scale: float) -> Result:
+    size = int(64 * MB * scale)
+    return await throughput(size, lambda: output(*emit(size), verbose=False))
+
+
+@scenario("combined")
+async def combined(scale: float) -> Result:
+    size = int(64 * MB * scale)
+    return await throughput(
+        2 * size,
+        lambda: output(*emit(size, size), combined=True, verbose=False),
+    )
+
+
+@scenario("split")
+async def split(scale: float) -> Result:
+    size = int(64 * MB * scale)
+    return await throughput(
+        2 * size,
+        lambda: output(*emit(size, size), combined=False, verbose=False),
+    )
+
+
+def run_one(name: str, scale: float) -> Result:
+    result = asyncio.run(SCENARIOS[name](scale))
+    # ru_maxrss is in KiB on Linux.
+    result["peak_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return result
+
+
+def run_isolated(name: str, scale: float) -> Result:
+    # The stdlib module, not boost.core.subprocess: this file is run as a
+    # script, so its own directory comes first on sys.path.
+    import subprocess
+
+    completed = subprocess.run(
+        [sys.executable, __file__, "--child", name, "--scale", str(scale)],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    return json.loads(completed.stdout)
+
+
+def regressions(
+        results: dict[str, Result],
+        baseline: dict[str, Result],
+        tolerance: float,
+) -> list[str]:
+    failures = []
+
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+
+        for metric in ("seconds", "peak_rss"):
+            limit = reference[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                failures.append(
+                    f"{name}: {metric} {result[metric]:.4g} exceeds "
+                    f"baseline {reference[metric]:.4g} (+{tolerance:.0%})"
+                )
+
+    return failures
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    for name in options.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}, pick from {', '.join(SCENARIOS)}")
+
+    if options.child:
+        json.dump(run_one(options.child, options.scale), sys.stdout)
+        return 0
+
+    results = {
+        name: run_isolated(name, options.scale)
+        for name in options.scenarios or SCENARIOS
+    }
+    report = {
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "scale": options.scale,
+        "results": results,
+    }
+    encoded = json.dumps(report, indent=2)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)["results"]
+
+        failures = regressions(results, baseline, options.tolerance)
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        return 1 if failures else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
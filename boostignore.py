@@ -0,0 +1,229 @@
+"""
+Compiled `.boostignore` matching.
+
+`.boostignore` follows gitignore semantics: `#` comments, `!` negation, a
+trailing "/" for directories only, patterns containing a "/" anchored at the
+root and others matching at any depth, and `*`, `?`, `[...]` and `**` globs.
+The last matching pattern decides, and nothing below an ignored directory can
+be re-included.
+
+`IgnoreMatcher` compiles the patterns once.  Literal anchored paths, the bulk
+of a typical file, go into a set; globs are folded into one combined regex per
+run of patterns with the same polarity, so a path is tested against a handful
+of regexes however many patterns there are.  Decisions on directories are
+memoised, and `walk()` prunes ignored directories instead of descending into
+them.  Only the root ignore file is read, not nested ones.
+
+    matcher = IgnoreMatcher.load(".boostignore")
+    for path in walk(".", matcher):
+        ...
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+__all__ = [
+    "IgnoreMatcher",
+    "walk",
+]
+
+
+GLOB_CHARS = re.compile(r"[*?\[\\]")
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def _translate(pattern: str) -> str:
+    out = []
+    i, n = 0, len(pattern)
+
+    while i < n:
+        char = pattern[i]
+
+        if char == "*":
+            stars = i
+            while i < n and pattern[i] == "*":
+                i += 1
+            double = i - stars >= 2
+            at_start = stars == 0 or pattern[stars - 1] == "/"
+
+            if double and at_start and i == n:
+                out.append(".*")
+            elif double and at_start and pattern[i] == "/":
+                # "**/" matches zero or more leading directories.
+                out.append("(?:.*/)?")
+                i += 1
+            else:
+                out.append("[^/]*")
+            continue
+
+        if char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            # A "]" right after "[" or "[!" is a member, not the end.
+            start = i + 2 if pattern[i + 1:i + 2] in ("!", "^") else i + 1
+            end = pattern.find("]", start + 1)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append(f"(?!/)[{body}]")
+                i = end
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+
+        i += 1
+
+    return "".join(out)
+
+
+class Rule:
+    __slots__ = ("negated", "directory", "anchored", "text")
+
+    def __init__(self, line: str) -> None:
+        self.negated = line.startswith("!")
+        if self.negated:
+            line = line[1:]
+        elif line.startswith("\\"):
+            line = line[1:] if line[1:2] in ("!", "#") else line
+
+        self.directory = line.endswith("/")
+        line = line.rstrip("/")
+        self.anchored = "/" in line
+        self.text = line.lstrip("/")
+
+    @property
+    def literal(self) -> bool:
+        return self.anchored and not GLOB_CHARS.search(self.text)
+
+    def regex(self) -> str:
+        prefix = "" if self.anchored else "(?:.*/)?"
+        return prefix + _translate(self.text)
+
+
+class Group:
+    # Consecutive rules of the same polarity, split by what they may match.
+    __slots__ = ("negated", "literals", "literal_dirs", "files", "dirs")
+
+    def __init__(self, negated: bool, rules: list[Rule]) -> None:
+        self.negated = negated
+        self.literals = {r.text for r in rules if r.literal and not r.directory}
+        self.literal_dirs = {r.text for r in rules if r.literal} | self.literals
+        globs = [r for r in rules if not r.literal]
+        self.files = self._combine(r.regex() for r in globs if not r.directory)
+        self.dirs = self._combine(r.regex() for r in globs)
+
+    @staticmethod
+    def _combine(patterns: Iterable[str]) -> Optional["re.Pattern[str]"]:
+        patterns = list(patterns)
+        if not patterns:
+            return None
+        return re.compile(f"(?:{'|'.join(patterns)})\\Z", re.DOTALL)
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        if path in (self.literal_dirs if is_dir else self.literals):
+            return True
+        regex = self.dirs if is_dir else self.files
+        return regex is not None and regex.match(path) is not None
+
+
+class IgnoreMatcher:
+    def __init__(self, lines: Iterable[str]) -> None:
+        rules = []
+
+        for line in lines:
+            line = line.rstrip("\n")
+            # Trailing spaces are dropped unless escaped.
+            stripped = line.rstrip(" ")
+            if stripped.endswith("\\") and len(stripped) < len(line):
+                stripped += " "
+            if stripped and not stripped.startswith("#"):
+                rules.append(Rule(stripped))
+
+        # Evaluated last group first: the last matching pattern decides.
+        self._groups: list[Group] = []
+        start = 0
+        for i in range(1, len(rules) + 1):
+            if i == len(rules) or rules[i].negated != rules[start].negated:
+                self._groups.append(Group(rules[start].negated, rules[start:i]))
+                start = i
+        self._groups.reverse()
+        self._directories: dict[str, bool] = {"": False}
+
+    @classmethod
+    def load(cls, path: StrPath) -> "IgnoreMatcher":
+        try:
+            with open(path, encoding="utf-8") as file:
+                return cls(file.readlines())
+        except FileNotFoundError:
+            return cls([])
+
+    def match(self, path: str, is_dir: bool = False) -> bool:
+        # `path` is relative to the root with "/" separators; the parent
+        # directories are assumed not to be ignored.
+        for group in self._groups:
+            if group.matches(path, is_dir):
+                return not group.negated
+        return False
+
+    def ignored_dir(self, path: str) -> bool:
+        try:
+            return self._directories[path]
+        except KeyError:
+            pass
+
+        parent = path.rpartition("/")[0]
+        ignored = self.ignored_dir(parent) or self.match(path, True)
+        self._directories[path] = ignored
+        return ignored
+
+    def ignored(self, path: str, is_dir: bool = False) -> bool:
+        path = path.strip("/")
+        if is_dir:
+            return self.ignored_dir(path)
+        parent = path.rpartition("/")[0]
+        return self.ignored_dir(parent) or self.match(path)
+
+
+def walk(
+        root: StrPath,
+        matcher: Optional[IgnoreMatcher] = None,
+        follow_symlinks: bool = False,
+        start: str = "",
+) -> Iterator[str]:
+    root = Path(root)
+    if matcher is None:
+        matcher = IgnoreMatcher.load(root / ".boostignore")
+
+    # Depth first from `start`, a directory below `root`; yielded paths are
+    # relative to `root` with "/" separators.
+    start = start.strip("/")
+    if start and matcher.ignored_dir(start):
+        return
+    stack = [start]
+    match = matcher.match
+
+    while stack:
+        directory = stack.pop()
+        prefix = f"{directory}/" if directory else ""
+
+        try:
+            entries = os.scandir(root / directory)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+        with entries:
+            for entry in entries:
+                path = prefix + entry.name
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if not match(path, True):
+                        stack.append(path)
+                elif not match(path):
+                    yield path
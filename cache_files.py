@@ -0,0 +1,110 @@
+"""
+Files written by the on-disk caches.
+
+`atomic_write()` replaces a file through a temporary file in the same
+directory and a rename, so concurrent readers and writers see either the old
+or the new content.  The file is created with mode 0600, like any `mkstemp`
+file, which keeps cached credentials private.
+
+`CacheDirectory` keeps a directory of entries under a byte cap.  The total is
+counted once, then kept up to date as entries are written; only when it
+exceeds the cap is the directory scanned again and the least recently used
+entries (oldest mtime) removed, down to `LOW_WATER` of the cap so the next
+scan is far away.  Entries written by other processes are only counted at the
+next scan.
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+__all__ = [
+    "CacheDirectory",
+    "atomic_write",
+]
+
+
+# Share of the cap an eviction frees the directory down to.
+LOW_WATER = 0.9
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def atomic_write(path: StrPath, data: bytes) -> None:
+    path = Path(path)
+    fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+
+
+class CacheDirectory:
+    def __init__(
+            self,
+            directory: StrPath,
+            max_size: int,
+            pattern: str = "*/*.json",
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.pattern = pattern
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        atomic_write(path, data)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += len(data) - replaced
+
+            if self._size > self.max_size:
+                self._evict(int(self.max_size * LOW_WATER))
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(self.max_size)
+
+    def _scan(self) -> tuple[list[tuple[int, int, Path]], int]:
+        entries = []
+        total = 0
+
+        for path in self.directory.glob(self.pattern):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+        return entries, total
+
+    def _evict(self, target: int) -> None:
+        entries, total = self._scan()
+
+        if total > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                # Another worker may be evicting the same entries concurrently.
+                path.unlink(missing_ok=True)
+                total -= size
+
+        self._size = total
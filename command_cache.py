@@ -0,0 +1,203 @@
+"""
+On-disk, content-addressed cache of `output()` results.
+
+Entries are keyed on the command line, the selected environment variables,
+every option that shapes the captured output and a digest of the declared
+input files and directories, so an unchanged scan is replayed instead of
+spawned.  Writes are atomic renames, which makes a cache
+directory safe to share between concurrent workers.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional, Union
+
+from boost.core.cache_files import CacheDirectory
+from boost.core.errors import BoostExecutionError
+from boost.core.subprocess import CompletedProcess, output
+
+__all__ = [
+    "CommandCache",
+    "cached_output",
+]
+
+
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+READ_SIZE = 1024 * 1024
+
+# execute()/output() keywords that cannot change what is captured.
+UNKEYED_OPTIONS = frozenset({
+    "batch_interval",
+    "batch_lines",
+    "check",
+    "chunk_size",
+    "env",  # keyed through the `env` names instead
+    "error_logger",
+    "log_policy",
+    "logger",
+    "on_complete",
+    "output_logger",
+    "spawn",
+    "timeout",
+    "verbose",
+})
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def _option(name: str, value: Any) -> str:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(value).hexdigest()
+
+    if callable(value):
+        # Functions are keyed by name, which only identifies module-level ones.
+        qualname = getattr(value, "__qualname__", "")
+        if not qualname or "<" in qualname:
+            raise ValueError(f"'{name}={value!r}' cannot be part of a cache key")
+        return f"{getattr(value, '__module__', None)}.{qualname}"
+
+    if not isinstance(value, (str, int, float, bool, type(None), os.PathLike)):
+        raise ValueError(f"'{name}' of type {type(value).__name__} cannot be cached")
+
+    return repr(value)
+
+
+class CommandCache:
+    def __init__(
+            self,
+            directory: StrPath,
+            max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self._files = CacheDirectory(self.directory, max_size)
+        # (path, size, mtime_ns, inode) -> digest, so unchanged inputs are only
+        # read once per process.
+        self._digests: dict[tuple[str, int, int, int], str] = {}
+
+    def key(
+            self,
+            args: Iterable[str],
+            env: Iterable[str] = (),
+            inputs: Iterable[StrPath] = (),
+            environ: Optional[Mapping[str, str]] = None,
+            **options: Any,
+    ) -> str:
+        environ = os.environ if environ is None else environ
+        material = {
+            "args": list(args),
+            "env": {name: environ.get(name) for name in sorted(env)},
+            "inputs": {path: self.digest(path) for path in sorted(map(str, inputs))},
+            "options": {name: _option(name, value) for name, value in options.items()},
+        }
+        encoded = json.dumps(material, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def digest(self, path: StrPath) -> str:
+        path = Path(path)
+
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file = Path(root, name)
+                    digest.update(str(file.relative_to(path)).encode("utf-8"))
+                    digest.update(self.digest(file).encode("ascii"))
+            return digest.hexdigest()
+
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return "missing"
+
+        memo = (str(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        if memo not in self._digests:
+            digest = hashlib.sha256()
+            with path.open("rb") as file:
+                while chunk := file.read(READ_SIZE):
+                    digest.update(chunk)
+            self._digests[memo] = digest.hexdigest()
+
+        return self._digests[memo]
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[CompletedProcess]:
+        path = self.path(key)
+
+        try:
+            entry = json.loads(path.read_bytes())
+            # The entry mtime doubles as its LRU timestamp.
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return CompletedProcess(
+            entry["command"],
+            tuple(entry["args"]),
+            entry["returncode"],
+            entry["stdout"],
+            entry["stderr"],
+        )
+
+    def put(self, key: str, result: CompletedProcess) -> None:
+        entry = {
+            "command": result.command,
+            "args": list(result.args),
+            "returncode": result.returncode,
+            "stdout": list(result.stdout),
+            "stderr": list(result.stderr),
+        }
+        self._files.write(self.path(key), json.dumps(entry).encode("utf-8"))
+
+    def evict(self) -> None:
+        self._files.evict()
+
+
+async def cached_output(
+        *args: str,
+        cache: CommandCache,
+        env: Iterable[str] = (),
+        inputs: Iterable[StrPath] = (),
+        check: Optional[bool] = True,
+        **kwargs: Any,
+) -> CompletedProcess:
+    if kwargs.get("mode", "text") != "text" or kwargs.get("overflow") == "spill":
+        raise ValueError("only text output can be cached")
+
+    options = {
+        name: value for name, value in kwargs.items() if name not in UNKEYED_OPTIONS
+    }
+    if isinstance(options.get("stdin_file"), int):
+        raise ValueError("stdin from a file descriptor cannot be cached")
+    if options.get("stdin_file") is not None:
+        inputs = [*inputs, options["stdin_file"]]
+
+    # Every option that may change the captured output is part of the key.
+    key = cache.key(
+        args,
+        env=env,
+        inputs=inputs,
+        environ=kwargs.get("env"),
+        **options,
+    )
+    result = cache.get(key)
+
+    if result is None:
+        result = await output(*args, check=check, **kwargs)
+        cache.put(key, result)
+
+    elif check and result.returncode != 0:
+        raise BoostExecutionError(
+            f"command '{result.command} {result.args}' exited with non-zero "
+            f"({result.returncode}) exit status",
+            process=result,
+        )
+
+    return result
@@ -0,0 +1,230 @@
+"""
+Rendering and publishing of the findings comment on a pull request.
+
+`render()` writes the "New Security Findings" table and the "New Security
+Fixes" `<details>` section in a single pass over the findings, cutting each
+section into parts that fit a comment's byte budget.  Every part becomes one
+comment that starts with a hidden marker carrying its section, index and a
+fingerprint of its content.  `publish()` reads the markers back from its own
+comments on the pull request and only creates, edits or deletes the parts
+whose fingerprint changed, so a push that leaves the fixes alone does not
+touch that comment.
+"""
+
+import hashlib
+import re
+from urllib.parse import quote
+from typing import Iterable, Iterator, Optional, Sequence
+
+from github_comments import CommentClient
+
+__all__ = [
+    "CommentPart",
+    "Finding",
+    "publish",
+    "render",
+]
+
+
+# GitHub rejects comment bodies over 65536 characters; leave headroom for the
+# continuation header and footer.
+DEFAULT_BUDGET = 60_000
+
+# Bytes kept for the hidden marker heading each part.
+MARKER_SIZE = 128
+
+# Longest rule title or description kept in a table cell.
+MAX_CELL = 1000
+
+IGNORE_HELP = (
+    "[Not an issue?](https://docs.boostsecurity.io/faq/index.html"
+    "#how-can-i-ignore-a-finding) Ignore it by adding a comment on the line "
+    "with just the word `noboost`."
+)
+
+MARKER = re.compile(
+    r"\A<!-- boost-findings section=(\w+) part=(\d+) fingerprint=(\w+) -->\n"
+)
+
+
+class Finding:
+    def __init__(
+            self,
+            rule_title: str,
+            rule_description: str,
+            path: str,
+            start_line: Optional[int] = None,
+            end_line: Optional[int] = None,
+    ) -> None:
+        self.rule_title = rule_title
+        self.rule_description = rule_description
+        self.path = path
+        self.start_line = start_line
+        self.end_line = end_line
+
+    def permalink(self, repository: str, sha: str) -> str:
+        # Quoted: GitHub's autolink stops at a space ("aks copy.tf").
+        link = f"https://github.com/{repository}/blob/{sha}/{quote(self.path)}"
+
+        if self.start_line is not None:
+            link += f"#L{self.start_line}"
+            if self.end_line is not None and self.end_line != self.start_line:
+                link += f"-L{self.end_line}"
+
+        return link
+
+
+class CommentPart:
+    __slots__ = ("section", "index", "content", "fingerprint")
+
+    def __init__(self, section: str, index: int, content: str) -> None:
+        self.section = section
+        self.index = index
+        self.content = content
+        self.fingerprint = hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.section, self.index
+
+    @property
+    def body(self) -> str:
+        return (
+            f"<!-- boost-findings section={self.section} part={self.index} "
+            f"fingerprint={self.fingerprint} -->\n{self.content}"
+        )
+
+
+def _plural(count: int, word: str, suffix: str = "s") -> str:
+    return f"{count} {word}{'' if count == 1 else suffix}"
+
+
+def _cell(text: str) -> str:
+    text = " ".join(text.split()).replace("|", "\\|")
+    if len(text) > MAX_CELL:
+        return text[:MAX_CELL - 3] + "..."
+    return text
+
+
+def _rows(findings: Iterable[Finding], repository: str, sha: str) -> Iterator[str]:
+    for finding in findings:
+        yield (
+            f"| **{_cell(finding.rule_title)}** <br/> {_cell(finding.rule_description)}\n"
+            f"| {finding.permalink(repository, sha)}\n"
+        )
+
+
+def _split(
+        section: str,
+        header: str,
+        rows: Iterable[str],
+        footer: str,
+        budget: int,
+        opening: str = "",
+) -> list[CommentPart]:
+    # Parts are collected as lists of strings joined once, sizes are tracked
+    # in UTF-8 bytes so the cut never needs the rendered text. `opening` is
+    # repeated at the top of every part, ahead of the table, to match what
+    # the footer closes.
+    table = f"{opening}| **Findings**\n| ------------\n"
+    fixed = len(footer.encode("utf-8")) + len(table.encode("utf-8"))
+    budget -= MARKER_SIZE
+    parts: list[CommentPart] = []
+    lines = [header, table]
+    size = len(header.encode("utf-8")) + fixed
+    continued = f"{header.splitlines()[0]} (continued)\n\n"
+
+    for row in rows:
+        row_size = len(row.encode("utf-8"))
+
+        if size + row_size > budget and len(lines) > 2:
+            lines.append(footer)
+            parts.append(CommentPart(section, len(parts), "".join(lines)))
+            lines = [continued, table]
+            size = len(continued.encode("utf-8")) + fixed
+
+        lines.append(row)
+        size += row_size
+
+    lines.append(footer)
+    parts.append(CommentPart(section, len(parts), "".join(lines)))
+    return parts
+
+
+def render(
+        findings: Sequence[Finding],
+        fixes: Sequence[Finding],
+        repository: str,
+        sha: str,
+        budget: int = DEFAULT_BUDGET,
+) -> list[CommentPart]:
+    parts = []
+
+    if findings:
+        parts += _split(
+            "findings",
+            f"### :warning:  {_plural(len(findings), 'New Security Finding')}\n"
+            f"The latest commit contains "
+            f"{_plural(len(findings), 'new security issue')}.\n\n",
+            _rows(findings, repository, sha),
+            f"\n{IGNORE_HELP}\n",
+            budget,
+        )
+
+    if fixes:
+        parts += _split(
+            "fixes",
+            f"### :rocket: {_plural(len(fixes), 'New Security Fix', 'es')}\n"
+            f"You just committed {_plural(len(fixes), 'security fix', 'es')}. "
+            ":sunglasses: Keep up the great work!\n\n",
+            _rows(fixes, repository, sha),
+            f"\n</details>\n\n{IGNORE_HELP}\n",
+            budget,
+            "<details>\n"
+            "<summary>:dart:Take a look at what issues you fixed.</summary>\n\n",
+        )
+
+    return parts
+
+
+def publish(
+        client: CommentClient,
+        repository: str,
+        number: int,
+        parts: Iterable[CommentPart],
+        author: str,
+) -> dict[str, int]:
+    # `author` is the login the client posts as, e.g. "boost-app[bot]". Anyone
+    # can paste a marker into a comment; only our own comments are edited or
+    # deleted.
+    existing: dict[tuple[str, int], tuple[int, str]] = {}
+
+    for comment in client.list_comments(repository, number):
+        if (comment.get("user") or {}).get("login") != author:
+            continue
+        match = MARKER.match(comment.get("body") or "")
+        if match:
+            section, index, fingerprint = match.groups()
+            existing[(section, int(index))] = (comment["id"], fingerprint)
+
+    counts = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+
+    for part in parts:
+        current = existing.pop(part.key, None)
+
+        if current is None:
+            client.create_comment(repository, number, part.body)
+            counts["created"] += 1
+        elif current[1] != part.fingerprint:
+            client.update_comment(repository, current[0], part.body)
+            counts["updated"] += 1
+        else:
+            counts["unchanged"] += 1
+
+    # Parts a previous push needed and this one does not, e.g. a section that
+    # shrank or went away.
+    for comment_id, _ in existing.values():
+        client.delete_comment(repository, comment_id)
+        counts["deleted"] += 1
+
+    return counts
@@ -0,0 +1,151 @@
+"""
+Minimal client for posting pull request comments.
+
+PyGithub fetches the repository and then the issue before it can comment, two
+GETs with large bodies per comment.  `CommentClient` builds the
+`/repos/{owner}/{repo}/issues/{number}/comments` URL itself and posts in a
+single request over a pooled keep-alive session.  Any `base_url` works,
+including a WireMock server replaying recorded mappings.  With a
+`ResponseCache`, reads through `get()` are served or revalidated from it.
+"""
+
+from typing import Any, Callable, Iterator, Optional, Union
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from github_http_cache import CachingAdapter, ResponseCache
+
+__all__ = [
+    "CommentClient",
+    "comment_url",
+    "comments_url",
+]
+
+
+DEFAULT_BASE_URL = "https://api.github.com"
+
+DEFAULT_TIMEOUT = 30.0
+
+# Connections kept alive per host.
+POOL_SIZE = 10
+
+PAGE_SIZE = 100
+
+Token = Union[str, Callable[[], str]]
+
+
+def repository_url(base_url: str, repository: str) -> str:
+    owner, _, name = repository.partition("/")
+    if not owner or not name:
+        raise ValueError(f"expected 'owner/repo', got '{repository}'")
+    return f"{base_url.rstrip('/')}/repos/{quote(owner, safe='')}/{quote(name, safe='')}"
+
+
+def comments_url(base_url: str, repository: str, number: int) -> str:
+    return f"{repository_url(base_url, repository)}/issues/{int(number)}/comments"
+
+
+def comment_url(base_url: str, repository: str, comment_id: int) -> str:
+    return f"{repository_url(base_url, repository)}/issues/comments/{int(comment_id)}"
+
+
+class CommentClient:
+    def __init__(
+            self,
+            token: Token,
+            base_url: str = DEFAULT_BASE_URL,
+            session: Optional[requests.Session] = None,
+            timeout: float = DEFAULT_TIMEOUT,
+            pool_size: int = POOL_SIZE,
+            cache: Optional[ResponseCache] = None,
+    ) -> None:
+        # A callable token is called before each request, which lets an
+        # InstallationTokenCache refresh it transparently.
+        self.token = token
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = session or self._session(pool_size, cache)
+
+    def __enter__(self) -> "CommentClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def create_comment(self, repository: str, number: int, body: str) -> Any:
+        response = self.post(repository, number, body)
+        response.raise_for_status()
+        return response.json()
+
+    def list_comments(self, repository: str, number: int) -> Iterator[Any]:
+        url = comments_url(self.base_url, repository, number)
+        page = 1
+
+        while True:
+            comments = self._request(
+                "GET", url, params={"per_page": PAGE_SIZE, "page": page}
+            )
+            yield from comments
+            if len(comments) < PAGE_SIZE:
+                return
+            page += 1
+
+    def update_comment(self, repository: str, comment_id: int, body: str) -> Any:
+        return self._request(
+            "PATCH", comment_url(self.base_url, repository, comment_id), json={"body": body}
+        )
+
+    def delete_comment(self, repository: str, comment_id: int) -> None:
+        self._request("DELETE", comment_url(self.base_url, repository, comment_id))
+
+    def get(self, path: str, **params: Any) -> Any:
+        return self._request(
+            "GET", f"{self.base_url.rstrip('/')}/{path.lstrip('/')}", params=params or None
+        )
+
+    def post(self, repository: str, number: int, body: str) -> requests.Response:
+        return self.session.post(
+            comments_url(self.base_url, repository, number),
+            json={"body": body},
+            headers={"Authorization": f"token {self._token()}"},
+            timeout=self.timeout,
+        )
+
+    def reserve_connections(self, count: int) -> None:
+        # Grows the pools to keep `count` concurrent requests alive: urllib3
+        # discards a connection returned to a full pool.
+        for adapter in set(self.session.adapters.values()):
+            if isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize < count:
+                adapter.init_poolmanager(
+                    adapter._pool_connections, count, block=adapter._pool_block
+                )
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> Any:
+        response = self.session.request(
+            method,
+            url,
+            headers={"Authorization": f"token {self._token()}"},
+            timeout=self.timeout,
+            **kwargs,
+        )
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    def _token(self) -> str:
+        return self.token() if callable(self.token) else self.token
+
+    @staticmethod
+    def _session(pool_size: int, cache: Optional[ResponseCache]) -> requests.Session:
+        session = requests.Session()
+        options = {"pool_connections": pool_size, "pool_maxsize": pool_size}
+        adapter = (
+            CachingAdapter(cache, **options) if cache else HTTPAdapter(**options)
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
@@ -0,0 +1,247 @@
+"""
+HTTP response cache for GitHub API reads.
+
+GitHub answers reads with an `ETag` and `Cache-Control: max-age=60`.
+`CachingAdapter` is a requests transport adapter that honours both: a GET
+within max-age of its last response is served from the `ResponseCache`
+without touching the network, and an older one is revalidated with
+`If-None-Match`, whose 304 answer does not count against the rate limit.
+Entries live in memory in LRU order under a byte cap and, with a directory,
+are also written to disk so they survive between runs.
+
+    session = requests.Session()
+    session.mount("https://", CachingAdapter(ResponseCache("~/.cache/boost/http")))
+"""
+
+import base64
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from boost.core.cache_files import CacheDirectory
+
+__all__ = [
+    "CachedResponse",
+    "CachingAdapter",
+    "ResponseCache",
+]
+
+
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Request headers GitHub varies its responses on.
+VARY_HEADERS = ("Accept", "Authorization")
+
+# Response headers refreshed from a 304, which carries no body; lowercase, as
+# header names are compared case-insensitively.
+REFRESHED_HEADERS = ("cache-control", "date", "etag", "last-modified", "x-ratelimit-")
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+class CachedResponse:
+    __slots__ = ("url", "status", "headers", "body", "stored")
+
+    def __init__(
+            self,
+            url: str,
+            status: int,
+            headers: Mapping[str, str],
+            body: bytes,
+            stored: float,
+    ) -> None:
+        self.url = url
+        self.status = status
+        # Proxies and servers may send header names in any case.
+        self.headers = CaseInsensitiveDict(headers)
+        self.body = body
+        self.stored = stored
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("ETag")
+
+    @property
+    def max_age(self) -> float:
+        cache_control = self.headers.get("Cache-Control", "")
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return 0.0
+        match = MAX_AGE.search(cache_control)
+        return float(match.group(1)) if match else 0.0
+
+    def fresh(self, now: float) -> bool:
+        return now - self.stored < self.max_age
+
+    def size(self) -> int:
+        return len(self.body) + sum(map(len, self.headers.values()))
+
+
+class ResponseCache:
+    def __init__(
+            self,
+            directory: Optional[StrPath] = None,
+            max_size: int = DEFAULT_MAX_SIZE,
+    ) -> None:
+        self.directory = Path(directory).expanduser() if directory else None
+        self.max_size = max_size
+        self.size = 0
+        self._files = (
+            CacheDirectory(self.directory, max_size) if self.directory else None
+        )
+        self._entries: collections.OrderedDict[str, CachedResponse] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        material = [request.method or "GET", request.url or ""]
+        material.extend(request.headers.get(name, "") for name in VARY_HEADERS)
+        return hashlib.sha256("\0".join(material).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = self._read(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size()
+
+            if entry.size() > self.max_size:
+                return
+
+            self._entries[key] = entry
+            self.size += entry.size()
+
+            while self.size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size()
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        if self.directory is None:
+            return None
+
+        path = self._path(key)
+
+        try:
+            entry = json.loads(path.read_bytes())
+            # The entry mtime doubles as its LRU timestamp.
+            os.utime(path)
+            return CachedResponse(
+                entry["url"],
+                entry["status"],
+                entry["headers"],
+                base64.b64decode(entry["body"]),
+                entry["stored"],
+            )
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        if self._files is None:
+            return
+
+        encoded = json.dumps(
+            {
+                "url": entry.url,
+                "status": entry.status,
+                "headers": dict(entry.headers),
+                "body": base64.b64encode(entry.body).decode("ascii"),
+                "stored": entry.stored,
+            }
+        ).encode("utf-8")
+        self._files.write(self._path(key), encoded)
+
+
+class CachingAdapter(HTTPAdapter):
+    def __init__(self, cache: Optional[ResponseCache] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.cache = cache or ResponseCache()
+        self.hits = 0
+        self.revalidated = 0
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if request.method != "GET" or "If-None-Match" in request.headers:
+            return super().send(request, **kwargs)
+
+        key = self.cache.key(request)
+        entry = self.cache.get(key)
+        now = time.time()
+
+        if entry is not None and entry.fresh(now):
+            self.hits += 1
+            return self._replay(request, entry)
+
+        if entry is not None and entry.etag:
+            request.headers["If-None-Match"] = entry.etag
+
+        response = super().send(request, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self.revalidated += 1
+            headers = entry.headers.copy()
+            for name, value in response.headers.items():
+                if name.lower().startswith(REFRESHED_HEADERS):
+                    headers[name] = value
+            entry = CachedResponse(entry.url, entry.status, headers, entry.body, now)
+            self.cache.put(key, entry)
+            return self._replay(request, entry)
+
+        if response.status_code == 200 and (
+                "ETag" in response.headers or "max-age" in response.headers.get("Cache-Control", "")
+        ):
+            # Reading .content consumes a streamed body; it is replayed from
+            # the cached copy.
+            self.cache.put(
+                key,
+                CachedResponse(
+                    response.url,
+                    response.status_code,
+                    response.headers,
+                    response.content,
+                    now,
+                ),
+            )
+
+        return response
+
+    @staticmethod
+    def _replay(request: requests.PreparedRequest, entry: CachedResponse) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry.status
+        response.headers = entry.headers.copy()
+        response._content = entry.body
+        response.url = entry.url
+        response.request = request
+        response.reason = "OK"
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
@@ -0,0 +1,252 @@
+"""
+Concurrent, rate-limit-aware posting of findings comments.
+
+`CommentPublisher.run()` posts a batch of comments with bounded concurrency over
+one keep-alive connection pool and yields each `Comment` as it completes, the
+same way `Executor.run()` yields commands.  Every response updates a
+`RateLimit` from its `X-RateLimit-Remaining` / `X-RateLimit-Reset` headers:
+requests run at full speed while the budget is comfortable, are spread evenly
+over the rest of the window once it runs low, and wait for the reset instead
+of failing when it is exhausted.  Posting a comment is not idempotent, so only
+failures GitHub certainly did not act on are retried: rate-limited (403/429)
+responses after `Retry-After` or the reset, and connection failures after an
+exponential backoff.  A 5xx or a read timeout is reported, not retried, as
+the comment may have been posted anyway.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterable, Mapping, Optional
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+from github_comments import CommentClient
+
+__all__ = [
+    "Comment",
+    "CommentPublisher",
+    "RateLimit",
+]
+
+
+logger = logging.getLogger("boost.github.publisher")
+
+DEFAULT_CONCURRENCY = 16
+
+# Requests kept in hand for other clients of the same installation.
+DEFAULT_RESERVE = 50
+
+# Below this share of the limit, requests are paced over the window.
+PACE_BELOW = 0.2
+
+DEFAULT_MAX_RETRIES = 5
+
+RETRY_STATUSES = {403, 429}
+
+
+def _unsent(error: requests.RequestException) -> bool:
+    # Only a connection that was never established proves the comment was
+    # not posted; NewConnectionError and name resolution failures derive
+    # from ConnectTimeoutError.
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(
+        reason, ConnectTimeoutError
+    )
+
+
+class Comment:
+    def __init__(self, repository: str, number: int, body: str) -> None:
+        self.repository = repository
+        self.number = number
+        self.body = body
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+
+class RateLimit:
+    def __init__(self, reserve: int = DEFAULT_RESERVE) -> None:
+        self.reserve = reserve
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset = 0.0
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = float(headers["X-RateLimit-Reset"])
+            limit = int(headers.get("X-RateLimit-Limit", remaining))
+        except (KeyError, ValueError):
+            return
+
+        # Responses to concurrent requests arrive out of order, so within a
+        # window the lowest count is the most recent one.
+        if self.remaining is None or reset > self.reset:
+            self.remaining = remaining
+        elif reset == self.reset:
+            self.remaining = min(self.remaining, remaining)
+        else:
+            return
+
+        self.reset = reset
+        self.limit = limit
+
+    def delay(self, now: float) -> float:
+        if self.remaining is None or now >= self.reset:
+            return 0.0
+
+        budget = self.remaining - self.reserve
+
+        if budget <= 0:
+            return self.reset - now
+
+        if self.limit and self.remaining > self.limit * PACE_BELOW:
+            return 0.0
+
+        return (self.reset - now) / budget
+
+    def consume(self) -> None:
+        # Counted when sent, so requests in flight are part of the budget.
+        if self.remaining is not None:
+            self.remaining -= 1
+
+
+class CommentPublisher:
+    def __init__(
+            self,
+            client: CommentClient,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            rate_limit: Optional[RateLimit] = None,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        self.client = client
+        self.concurrency = concurrency
+        client.reserve_connections(concurrency)
+        self.rate_limit = rate_limit or RateLimit()
+        self.max_retries = max_retries
+        self._gate: Optional[asyncio.Lock] = None
+
+    @property
+    def gate(self) -> asyncio.Lock:
+        # Created lazily so the lock binds to the running event loop.
+        if self._gate is None:
+            self._gate = asyncio.Lock()
+        return self._gate
+
+    async def run(self, comments: Iterable[Comment]) -> AsyncIterator[Comment]:
+        pending = iter(comments)
+        finished: asyncio.Queue[Optional[Comment]] = asyncio.Queue()
+
+        # requests is blocking: each worker posts from its own thread, all of
+        # them sharing the client's connection pool.
+        threads = ThreadPoolExecutor(self.concurrency)
+
+        async def work() -> None:
+            try:
+                for comment in pending:
+                    await self._publish(comment, threads)
+                    finished.put_nowait(comment)
+            finally:
+                finished.put_nowait(None)
+
+        workers = [asyncio.create_task(work()) for _ in range(self.concurrency)]
+        active = len(workers)
+
+        try:
+            while active:
+                comment = await finished.get()
+                if comment is None:
+                    active -= 1
+                else:
+                    yield comment
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            # Not waiting: when the consumer stops early, posts still in flight
+            # would block the event loop for up to their timeout each.
+            threads.shutdown(wait=False, cancel_futures=True)
+
+    async def publish(self, comment: Comment) -> Any:
+        threads = ThreadPoolExecutor(1)
+
+        try:
+            await self._publish(comment, threads)
+        finally:
+            threads.shutdown(wait=False, cancel_futures=True)
+
+        if comment.error:
+            raise comment.error
+        return comment.result
+
+    async def _publish(self, comment: Comment, threads: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn()
+
+            try:
+                response = await loop.run_in_executor(
+                    threads,
+                    self.client.post,
+                    comment.repository,
+                    comment.number,
+                    comment.body,
+                )
+            except requests.RequestException as e:
+                if attempt == self.max_retries or not _unsent(e):
+                    comment.error = e
+                    return
+                await asyncio.sleep(2**attempt)
+                continue
+
+            self.rate_limit.update(response.headers)
+            retry_after = self._retry_after(response, attempt)
+
+            if retry_after is None or attempt == self.max_retries:
+                try:
+                    response.raise_for_status()
+                    comment.result = response.json()
+                except (requests.RequestException, ValueError) as e:
+                    comment.error = e
+                return
+
+            logger.debug(
+                f"{comment.repository}#{comment.number}: HTTP {response.status_code}, "
+                f"retrying in {retry_after:.1f}s"
+            )
+            await asyncio.sleep(retry_after)
+
+    async def _wait_turn(self) -> None:
+        # Serialised so that paced requests are spaced out rather than all
+        # released together when their delays expire.
+        async with self.gate:
+            delay = self.rate_limit.delay(time.time())
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.rate_limit.consume()
+
+    def _retry_after(self, response: requests.Response, attempt: int) -> Optional[float]:
+        if response.status_code not in RETRY_STATUSES:
+            return None
+
+        headers = response.headers
+
+        if "Retry-After" in headers:
+            try:
+                return float(headers["Retry-After"])
+            except ValueError:
+                pass
+
+        if response.status_code == 403:
+            # A 403 is only retried when it is a rate limit, not a permission
+            # error.
+            if headers.get("X-RateLimit-Remaining") != "0":
+                return None
+            return max(0.0, float(headers.get("X-RateLimit-Reset", 0)) - time.time())
+
+        return float(2**attempt)
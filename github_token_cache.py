@@ -0,0 +1,163 @@
+"""
+Cache of GitHub App installation access tokens.
+
+An installation token is valid for an hour, so fetching one before every API
+call wastes a round trip and rate limit.  `InstallationTokenCache` keeps tokens
+keyed by GitHub host, app id and installation id and only asks GitHub for a
+new one when the cached token is within `refresh_margin` of its `expires_at`.
+With a `path`, the tokens are also shared between processes through a JSON
+file: writes are atomic renames and refreshes are serialised by an advisory
+lock, so concurrent workers request a single token between them.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+from boost.core.cache_files import atomic_write
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+__all__ = [
+    "InstallationToken",
+    "InstallationTokenCache",
+]
+
+
+REFRESH_MARGIN = timedelta(minutes=5)
+
+DEFAULT_BASE_URL = "https://api.github.com"
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+class InstallationToken:
+    __slots__ = ("token", "expires_at")
+
+    def __init__(self, token: str, expires_at: datetime) -> None:
+        self.token = token
+        # PyGithub returns naive datetimes in UTC.
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        self.expires_at = expires_at
+
+    def fresh(self, margin: timedelta) -> bool:
+        return datetime.now(timezone.utc) + margin < self.expires_at
+
+
+class InstallationTokenCache:
+    def __init__(
+            self,
+            integration: Any,
+            app_id: Optional[int] = None,
+            path: Optional[StrPath] = None,
+            base_url: Optional[str] = None,
+            refresh_margin: timedelta = REFRESH_MARGIN,
+    ) -> None:
+        self.integration = integration
+        self.app_id = app_id if app_id is not None else integration.integration_id
+        self.path = Path(path) if path is not None else None
+        # Installation ids are only unique per host: GitHub Enterprise servers
+        # and github.com may share a cache file.
+        if base_url is None:
+            base_url = getattr(integration, "base_url", DEFAULT_BASE_URL)
+        self.base_url = base_url.rstrip("/")
+        self.refresh_margin = refresh_margin
+        self._tokens: dict[str, InstallationToken] = {}
+        self._lock = threading.Lock()
+
+    def get(self, installation_id: int) -> str:
+        return self.token(installation_id).token
+
+    def token(self, installation_id: int) -> InstallationToken:
+        key = self._key(installation_id)
+        cached = self._tokens.get(key)
+
+        if cached and cached.fresh(self.refresh_margin):
+            return cached
+
+        # One refresh per process at a time; a thread that waited on the lock
+        # usually finds the token another one just fetched.
+        with self._lock, self._shared():
+            cached = self._tokens.get(key)
+
+            if not cached or not cached.fresh(self.refresh_margin):
+                cached = self._load().get(key)
+
+            if not cached or not cached.fresh(self.refresh_margin):
+                auth = self.integration.get_access_token(installation_id)
+                cached = InstallationToken(auth.token, auth.expires_at)
+                self._store(key, cached)
+
+            self._tokens[key] = cached
+            return cached
+
+    def invalidate(self, installation_id: int) -> None:
+        # For a token GitHub rejected before it expired, e.g. after the app
+        # was reinstalled.
+        key = self._key(installation_id)
+
+        with self._lock, self._shared():
+            self._tokens.pop(key, None)
+            if self.path is not None:
+                tokens = self._load()
+                if tokens.pop(key, None):
+                    self._write(tokens)
+
+    def _key(self, installation_id: int) -> str:
+        return f"{self.base_url} {self.app_id}/{installation_id}"
+
+    @contextmanager
+    def _shared(self) -> Iterator[None]:
+        if self.path is None or fcntl is None:
+            yield
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _load(self) -> dict[str, InstallationToken]:
+        if self.path is None:
+            return {}
+
+        try:
+            entries = json.loads(self.path.read_bytes())
+            return {
+                key: InstallationToken(
+                    entry["token"], datetime.fromisoformat(entry["expires_at"])
+                )
+                for key, entry in entries.items()
+            }
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _store(self, key: str, token: InstallationToken) -> None:
+        if self.path is None:
+            return
+
+        tokens = self._load()
+        tokens[key] = token
+        self._write(tokens)
+
+    def _write(self, tokens: dict[str, InstallationToken]) -> None:
+        assert self.path is not None
+        entries = {
+            key: {"token": token.token, "expires_at": token.expires_at.isoformat()}
+            for key, token in tokens.items()
+            if token.fresh(timedelta(0))
+        }
+
+        # Created 0600: the tokens are credentials.
+        atomic_write(self.path, json.dumps(entries).encode("utf-8"))
@@ -0,0 +1,243 @@
+"""
+Incremental JSON parsing of command output.
+
+`records()` runs a command and yields parsed findings while the tool is still
+writing: one object per line for NDJSON, or one object per element of an array
+inside a (possibly huge) JSON document, located by `path`.  For SARIF,
+`path=SARIF_RESULTS`, i.e. ("runs", "*", "results"), yields every result of
+every run.  Only the element being parsed is buffered, never the whole
+document.
+"""
+
+import codecs
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Union
+
+from boost.core.subprocess import stream
+
+__all__ = [
+    "JSONArrayParser",
+    "NDJSONParser",
+    "SARIF_RESULTS",
+    "parse_stage",
+    "records",
+]
+
+
+SARIF_RESULTS = ("runs", "*", "results")
+
+WHITESPACE = " \t\n\r"
+
+# Consumed text kept in the buffer before it is compacted.
+COMPACT_AFTER = 64 * 1024
+
+# What a number cut at the end of the buffer may still be followed by:
+# raw_decode stops before "2." or "1e+", and returns 2 or 1 as complete.
+NUMBER_CONTINUATIONS = {".", "e", "E", "e+", "e-", "E+", "E-"}
+
+
+class NDJSONParser:
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, lines: Union[bytes, Iterable[bytes]]) -> list[Any]:
+        if isinstance(lines, (bytes, bytearray)):
+            lines = [lines]
+        decode = self._decoder.decode
+        return [decode(str(line, "utf-8")) for line in lines if line.strip()]
+
+    def close(self) -> list[Any]:
+        return []
+
+
+class JSONArrayParser:
+    def __init__(self, path: Iterable[str] = ()) -> None:
+        self.path = tuple(path)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._scan = json.JSONDecoder().raw_decode
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._done = False
+        self._retry_size = 0
+        # ("value", level) expects a value at path level `level`; ("object",
+        # level), ("array", level) and ("items",) are containers being walked,
+        # "items" being the target array whose elements are emitted.
+        self._stack: list[tuple[Any, ...]] = [("value", 0)]
+
+    def feed(self, data: bytes) -> list[Any]:
+        self._buffer += self._text.decode(data)
+        return self._run()
+
+    def close(self) -> list[Any]:
+        self._buffer += self._text.decode(b"", final=True)
+        self._eof = True
+        items = self._run()
+
+        if not self._done:
+            raise ValueError("truncated JSON document")
+
+        return items
+
+    def _run(self) -> list[Any]:
+        items: list[Any] = []
+
+        while self._stack and self._step(items):
+            pass
+
+        if not self._stack:
+            self._done = True
+
+        if self._pos > COMPACT_AFTER:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        return items
+
+    def _peek(self) -> str:
+        buffer, pos = self._buffer, self._pos
+
+        while pos < len(buffer) and buffer[pos] in WHITESPACE:
+            pos += 1
+
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else ""
+
+    def _decode(self) -> tuple[bool, Any]:
+        pending = len(self._buffer) - self._pos
+
+        # After a failed attempt, wait for the pending text to double before
+        # scanning a large value again, keeping the total work linear.
+        if pending < self._retry_size and not self._eof:
+            return False, None
+
+        try:
+            value, end = self._scan(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._eof:
+                raise
+            value, end = None, len(self._buffer)
+
+        # A value is only complete once something follows it: "12" at the end
+        # of the buffer may still become "123", and "2." may become "2.5".
+        if not self._eof and (
+                end >= len(self._buffer)
+                or (
+                    isinstance(value, (int, float))
+                    and not isinstance(value, bool)
+                    and self._buffer[end:end + 3] in NUMBER_CONTINUATIONS
+                )
+        ):
+            self._retry_size = 2 * pending
+            return False, None
+
+        self._retry_size = 0
+        self._pos = end
+        return True, value
+
+    def _step(self, items: list[Any]) -> bool:
+        frame = self._stack[-1]
+        char = self._peek()
+
+        if not char:
+            if self._eof:
+                raise ValueError("truncated JSON document")
+            return False
+
+        kind = frame[0]
+
+        if kind == "value":
+            level = frame[1]
+            self._stack.pop()
+
+            if level == len(self.path):
+                expected, frame = "[", ("items",)
+            elif self.path[level] == "*":
+                expected, frame = "[", ("array", level)
+            else:
+                expected, frame = "{", ("object", level)
+
+            if char != expected:
+                raise ValueError(
+                    f"expected '{expected}' at {'/'.join(self.path[:level]) or 'root'}"
+                )
+
+            self._pos += 1
+            self._stack.append(frame)
+            return True
+
+        if char in ",]}":
+            self._pos += 1
+            if char != ",":
+                self._stack.pop()
+            return True
+
+        if kind == "items":
+            complete, value = self._decode()
+            if complete:
+                items.append(value)
+            return complete
+
+        if kind == "array":
+            self._stack.append(("value", frame[1] + 1))
+            return True
+
+        # Inside an object: a key, a colon, then either the path continues
+        # into the value or the value is skipped whole.
+        start = self._pos
+        complete, key = self._decode()
+
+        if not complete:
+            return False
+
+        if self._peek() != ":":
+            if not self._peek() and not self._eof:
+                self._pos = start
+                return False
+            raise ValueError(f"expected ':' after key {key!r}")
+
+        self._pos += 1
+
+        if key == self.path[frame[1]]:
+            self._stack.append(("value", frame[1] + 1))
+            return True
+
+        self._peek()
+        complete, _ = self._decode()
+
+        if not complete:
+            self._pos = start
+
+        return complete
+
+
+Parser = Union[NDJSONParser, JSONArrayParser]
+
+
+def parse_stage(
+        parser: Parser,
+        on_item: Callable[[Any], Awaitable[None]],
+) -> Callable[[Any], Awaitable[None]]:
+    # A stdout_cb for execute(mode="chunks") or execute(mode="lines").
+    async def consume(data: Any) -> None:
+        for item in parser.feed(data):
+            await on_item(item)
+
+    return consume
+
+
+async def records(
+        *args: str,
+        path: Iterable[str] = (),
+        ndjson: bool = False,
+        **kwargs: Any,
+) -> AsyncIterator[Any]:
+    parser: Parser = NDJSONParser() if ndjson else JSONArrayParser(path)
+    output = stream(*args, mode="lines" if ndjson else "chunks", **kwargs)
+
+    async for data in output:
+        for item in parser.feed(data):
+            yield item
+
+    for item in parser.close():
+        yield item
@@ -0,0 +1,230 @@
+"""
+Compact storage for recorded WireMock mappings.
+
+A recording dump repeats the same response headers in every mapping and embeds
+each response body as an escaped JSON string.  The store is JSON Lines, gzipped
+when the file name ends in ".gz", with one record per line:
+
+    {"blob": "<hash>", "json": {...}}        a JSON body, stored unescaped
+    {"blob": "<hash>", "value": ...}         a text body or a header set
+    {"mapping": {... {"$blob": "<hash>"} ...}}
+
+Bodies and header sets are stored once, keyed by a content hash, and always
+before the first mapping referencing them, so `read_mappings()` rebuilds one
+mapping at a time while streaming the file.  Normalisation strips volatile
+response headers (dates, request ids, rate-limit counters, security headers)
+and mapping ids, and drops mappings that are identical after that.
+
+    python mapping_store.py recording.json mappings/ -o fixtures.jsonl.gz
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import IO, Any, Collection, Iterable, Iterator, Optional, Union
+
+__all__ = [
+    "MappingWriter",
+    "normalize",
+    "read_mappings",
+    "write_mappings",
+]
+
+
+VOLATILE_HEADERS = frozenset(
+    {
+        "content-security-policy",
+        "date",
+        "referrer-policy",
+        "server",
+        "strict-transport-security",
+        "x-content-type-options",
+        "x-frame-options",
+        "x-github-request-id",
+        "x-ratelimit-limit",
+        "x-ratelimit-remaining",
+        "x-ratelimit-reset",
+        "x-ratelimit-resource",
+        "x-ratelimit-used",
+        "x-xss-protection",
+    }
+)
+
+# Regenerated by WireMock when the mappings are imported.
+VOLATILE_FIELDS = ("id", "uuid")
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _open(path: StrPath, mode: str) -> IO[str]:
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def normalize(
+        mapping: dict[str, Any],
+        strip_headers: Collection[str] = VOLATILE_HEADERS,
+) -> dict[str, Any]:
+    mapping = {k: v for k, v in mapping.items() if k not in VOLATILE_FIELDS}
+    response = mapping.get("response")
+
+    if response and "headers" in response:
+        mapping["response"] = response = dict(response)
+        response["headers"] = {
+            name: value
+            for name, value in response["headers"].items()
+            if name.lower() not in strip_headers
+        }
+
+    return mapping
+
+
+class MappingWriter:
+    def __init__(
+            self,
+            file: IO[str],
+            strip_headers: Collection[str] = VOLATILE_HEADERS,
+    ) -> None:
+        self.file = file
+        self.strip_headers = strip_headers
+        self.written = 0
+        self.duplicates = 0
+        self._blobs: set[str] = set()
+        self._mappings: set[str] = set()
+
+    def write(self, mapping: dict[str, Any]) -> bool:
+        mapping = normalize(mapping, self.strip_headers)
+        digest = hashlib.sha256(_encode(mapping).encode("utf-8")).hexdigest()
+
+        if digest in self._mappings:
+            self.duplicates += 1
+            return False
+
+        self._mappings.add(digest)
+        response = mapping.get("response")
+
+        if response:
+            mapping["response"] = response = dict(response)
+            if isinstance(response.get("body"), str):
+                response["body"] = self._blob(response["body"], body=True)
+            if response.get("headers"):
+                response["headers"] = self._blob(response["headers"])
+
+        self.file.write(_encode({"mapping": mapping}) + "\n")
+        self.written += 1
+        return True
+
+    def _blob(self, value: Any, body: bool = False) -> dict[str, str]:
+        encoded = _encode(value)
+        digest = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+        if digest not in self._blobs:
+            self._blobs.add(digest)
+            record: dict[str, Any] = {"blob": digest, "value": value}
+
+            if body:
+                # Stored parsed only when it re-encodes to the exact recorded
+                # text, so replayed bodies stay byte for byte identical.
+                try:
+                    parsed = json.loads(value)
+                except ValueError:
+                    parsed = None
+                if parsed is not None and _encode(parsed) == value:
+                    record = {"blob": digest, "json": parsed}
+
+            self.file.write(_encode(record) + "\n")
+
+        return {"$blob": digest}
+
+
+def write_mappings(
+        mappings: Iterable[dict[str, Any]],
+        path: StrPath,
+        strip_headers: Collection[str] = VOLATILE_HEADERS,
+) -> MappingWriter:
+    with _open(path, "w") as file:
+        writer = MappingWriter(file, strip_headers)
+        for mapping in mappings:
+            writer.write(mapping)
+    return writer
+
+
+def read_mappings(path: StrPath) -> Iterator[dict[str, Any]]:
+    blobs: dict[str, Any] = {}
+
+    def resolve(value: Any) -> Any:
+        if isinstance(value, dict) and "$blob" in value:
+            return blobs[value["$blob"]]
+        return value
+
+    with _open(path, "r") as file:
+        for line in file:
+            record = json.loads(line)
+
+            if "blob" in record:
+                if "json" in record:
+                    blobs[record["blob"]] = _encode(record["json"])
+                else:
+                    blobs[record["blob"]] = record["value"]
+                continue
+
+            mapping = record["mapping"]
+            response = mapping.get("response")
+            if response:
+                for field in ("body", "headers"):
+                    if field in response:
+                        response[field] = resolve(response[field])
+            yield mapping
+
+
+def _source_mappings(path: Path) -> Iterator[dict[str, Any]]:
+    if path.is_dir():
+        for file in sorted(path.glob("*.json")):
+            yield from _source_mappings(file)
+        return
+
+    if path.name.endswith((".jsonl", ".jsonl.gz")):
+        yield from read_mappings(path)
+        return
+
+    document = json.loads(path.read_bytes())
+    if isinstance(document, list):
+        yield from document
+    else:
+        yield from document.get("mappings", [document])
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compact recorded WireMock mappings.")
+    parser.add_argument("sources", nargs="+", type=Path)
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument(
+        "--keep-header",
+        action="append",
+        default=[],
+        help="volatile header to keep, may be repeated",
+    )
+    options = parser.parse_args(argv)
+
+    strip = VOLATILE_HEADERS - {name.lower() for name in options.keep_header}
+    mappings = (m for source in options.sources for m in _source_mappings(source))
+    writer = write_mappings(mappings, options.output, strip)
+
+    print(
+        f"{writer.written} mappings written, {writer.duplicates} duplicates dropped",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Low-overhead logging of command output.
+
+`execute` hands every stdout/stderr line to an `OutputLog` when running
+verbose.  The log batches lines into a single record, enforces per-process
+rate and byte budgets, and can reduce a run to a summary, or to its last lines
+when the command fails.  `enable_background_logging` moves the handlers of the
+output loggers behind a queue so handler I/O never blocks the event loop.
+"""
+
+import atexit
+import collections
+import logging
+import logging.handlers
+import queue
+import time
+from typing import Any, Iterable, Literal, Optional
+
+__all__ = [
+    "OutputLog",
+    "OutputLogPolicy",
+    "enable_background_logging",
+]
+
+
+# "full": every line, batched and subject to the policy budgets.
+# "summary": only line and byte counts once the command exits.
+# "tail": the last `tail_lines` lines if the command fails, else a summary.
+LogMode = Literal["full", "summary", "tail"]
+
+OUTPUT_LOGGERS = ("boost.command.stdout", "boost.command.stderr")
+
+MAX_LINE_LENGTH = 1024
+
+
+class OutputLogPolicy:
+    def __init__(
+            self,
+            mode: LogMode = "full",
+            batch_lines: int = 256,
+            flush_interval: float = 0.5,
+            max_lines_per_second: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+            sample_every: int = 1,
+            tail_lines: int = 100,
+    ) -> None:
+        self.mode = mode
+        self.batch_lines = batch_lines
+        self.flush_interval = flush_interval
+        self.max_lines_per_second = max_lines_per_second
+        self.max_bytes = max_bytes
+        self.sample_every = sample_every
+        self.tail_lines = tail_lines
+
+
+default_policy = OutputLogPolicy()
+
+
+class OutputLog:
+    def __init__(
+            self,
+            logger: logging.Logger,
+            command: str,
+            policy: Optional[OutputLogPolicy] = None,
+    ) -> None:
+        self.logger = logger
+        self.command = command
+        self.policy = policy or default_policy
+        self.lines = 0
+        self.bytes = 0
+        self.logged_bytes = 0
+        self.suppressed = 0
+        self._batch: list[str] = []
+        self._batch_started = 0.0
+        self._tail: collections.deque[str] = collections.deque(
+            maxlen=self.policy.tail_lines
+        )
+        self._allowance = self.policy.max_lines_per_second or 0.0
+        self._last_refill = time.monotonic()
+
+    def write(self, data: Any) -> None:
+        if isinstance(data, list):
+            for line in data:
+                self.write(line)
+            return
+
+        line = _printable(data)
+        self.lines += 1
+        self.bytes += _size(data)
+        mode = self.policy.mode
+
+        if mode == "tail":
+            self._tail.append(line)
+        elif mode == "full":
+            if self._admit(line):
+                self._append(line)
+            else:
+                self.suppressed += 1
+
+    def close(self, failed: bool = False) -> None:
+        mode = self.policy.mode
+
+        if mode == "full":
+            self._flush()
+            if self.suppressed:
+                self.logger.debug(
+                    f"{self.command}: {self.suppressed} of {self.lines} lines "
+                    "not logged (output log budget)"
+                )
+            return
+
+        if mode == "tail" and failed and self._tail:
+            omitted = self.lines - len(self._tail)
+            header = f"{self.command}: last {len(self._tail)} lines"
+            if omitted:
+                header += f" ({omitted} earlier lines omitted)"
+            self.logger.debug("\n".join((header + ":", *self._tail)))
+            return
+
+        if self.lines:
+            self.logger.debug(
+                f"{self.command}: {self.lines} lines, {self.bytes} bytes"
+            )
+
+    def _admit(self, line: str) -> bool:
+        policy = self.policy
+
+        if policy.sample_every > 1 and (self.lines - 1) % policy.sample_every:
+            return False
+
+        if policy.max_bytes is not None:
+            if self.logged_bytes + len(line) > policy.max_bytes:
+                return False
+
+        if policy.max_lines_per_second:
+            now = time.monotonic()
+            self._allowance = min(
+                policy.max_lines_per_second,
+                self._allowance + (now - self._last_refill) * policy.max_lines_per_second,
+            )
+            self._last_refill = now
+            if self._allowance < 1:
+                return False
+            self._allowance -= 1
+
+        self.logged_bytes += len(line)
+        return True
+
+    def _append(self, line: str) -> None:
+        batch = self._batch
+
+        if not batch:
+            self._batch_started = time.monotonic()
+
+        batch.append(line)
+
+        if (
+                len(batch) >= self.policy.batch_lines
+                or time.monotonic() - self._batch_started >= self.policy.flush_interval
+        ):
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            self.logger.debug("\n".join(self._batch))
+            self._batch.clear()
+
+
+def _size(data: Any) -> int:
+    # Bytes in the line as the command wrote it, not in its logged form.
+    if isinstance(data, str):
+        # isascii() is a flag check; only other text needs encoding to count.
+        return len(data) if data.isascii() else len(data.encode("utf-8"))
+    try:
+        return len(data)
+    except TypeError:
+        return len(_printable(data))
+
+
+def _printable(data: Any) -> str:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = str(bytes(data[0:MAX_LINE_LENGTH]), "utf-8", errors="replace")
+    elif not isinstance(data, str):
+        data = repr(data)
+
+    if len(data) > MAX_LINE_LENGTH:
+        return data[0:MAX_LINE_LENGTH - 3] + "..."
+    return data
+
+
+class _Listener(logging.handlers.QueueListener):
+    def stop(self) -> None:
+        # Safe to call twice: once by the owner and once more at exit.
+        if self._thread:
+            super().stop()
+
+
+def enable_background_logging(
+        names: Iterable[str] = OUTPUT_LOGGERS,
+) -> logging.handlers.QueueListener:
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    handlers: list[logging.Handler] = []
+
+    for name in names:
+        logger = logging.getLogger(name)
+        current: Optional[logging.Logger] = logger
+
+        # Loggers without handlers of their own log through their ancestors;
+        # take over those handlers so the queue sits in front of all of them.
+        while current and not current.handlers and current.propagate:
+            current = current.parent
+
+        for handler in (current.handlers if current else []):
+            if handler not in handlers:
+                handlers.append(handler)
+
+        logger.handlers = [logging.handlers.QueueHandler(records)]
+        logger.propagate = False
+
+    listener = _Listener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
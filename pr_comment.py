@@ -9,9 +9,14 @@ from pathlib import Path
 
 import requests
 from boostsec.testing.wire_mock import WireMock, WireMockServer
-from github import Github, GithubIntegration
+from github import GithubIntegration
 from github.MainClass import DEFAULT_BASE_URL
 
+from findings_comment import Finding, render
+from github_comments import CommentClient
+from github_token_cache import InstallationTokenCache
+from mapping_store import write_mappings
+
 # ENVIRONMENT SETUP
 github_app_id = 155688
 installation_id = 21045661
@@ -42,57 +47,32 @@ requests.post(
 
 # OPEN GIT REPO
 integration = GithubIntegration(github_app_id, private_key, base_url=server.url)
-auth_obj = integration.get_access_token(installation_id)  # Token good for 1 hour
-github_client = Github(auth_obj.token, base_url=server.url)
-repo = github_client.get_repo(test_repo)
-
-# HACK TO OVERRIDE URL RETURNED BY GITHUB
-repo._url.value = repo._url.value.replace("https://api.github.com", server.url)
-
-issue = repo.get_issue(pull_request_id)
-issue._url.value = issue._url.value.replace("https://api.github.com", server.url)
-
-print(issue.url)
-print(issue)
-result = issue.create_comment(
-    """\
-### :warning:  3 New Security Finding~~s~~
-The latest commit contains 3 new security issue~~s~~.
-
-| **Findings**
-| ------------
-| **My Rule Title** <br/> Rule description
-| https://github.com/martin-boost-dev/test-repo/blob/c000c45b6f7658abdd5f0457675671921540f2a2/README.md#L3
-| **My Rule Title2** <br/> Rule description
-| https://github.com/martin-boost-dev/test-repo/blob/c000c45b6f7658abdd5f0457675671921540f2a2/README.md#L2-L3
-
-[Not an issue?](https://docs.boostsecurity.io/faq/index.html#how-can-i-ignore-a-finding) Ignore it by adding a comment on the line with just the word `noboost`.
-
----
+# In memory only: a token cached by an earlier run would skip the access token
+# request and leave it out of the recording.
+tokens = InstallationTokenCache(integration, github_app_id, base_url=server.url)
+# POST STRAIGHT TO THE ISSUE COMMENTS URL, NO REPO/ISSUE LOOKUPS
+comments = CommentClient(lambda: tokens.get(installation_id), base_url=server.url)
 
-### :rocket: 2 New Security Fix~~s~~
-You just committed 2 security fix~~s~~. :sunglasses: Keep up the great work!
-
-<details>
-<summary>:dart:Take a look at what issues you fixed.</summary>
-
-| **Findings**
-| ------------
-| **My Rule Title** <br/> Rule description
-| https://github.com/martin-boost-dev/test-repo/blob/c000c45b6f7658abdd5f0457675671921540f2a2/README.md
-| **My Rule Title2** <br/> Rule description
-| https://github.com/martin-boost-dev/test-repo/blob/c000c45b6f7658abdd5f0457675671921540f2a2/READMEMISS.md#L2-L3
-
-</details>
-
-[Not an issue?](https://docs.boostsecurity.io/faq/index.html#how-can-i-ignore-a-finding) Ignore it by adding a comment on the line with just the word `noboost`.
-"""  # noqa: E501
-)
-print(result)
+# RENDER AND POST THE FINDINGS, ONE COMMENT PER SECTION PART
+sha = "c000c45b6f7658abdd5f0457675671921540f2a2"
+findings = [
+    Finding("My Rule Title", "Rule description", "README.md", 3),
+    Finding("My Rule Title2", "Rule description", "README.md", 2, 3),
+    Finding("My Rule Title3", "Rule description", "main.tf", 7),
+]
+fixes = [
+    Finding("My Rule Title", "Rule description", "README.md"),
+    Finding("My Rule Title2", "Rule description", "READMEMISS.md", 2, 3),
+]
+for part in render(findings, fixes, test_repo, sha):
+    result = comments.create_comment(test_repo, pull_request_id, part.body)
+    print(result)
 
 result = requests.post(f"{server.admin_url}/recordings/stop")
 # SHOW RESULT IN TERMINAL
 print(json.dumps(result.json(), indent=2))
+# AND KEEP A COMPACT COPY FOR REPLAY
+write_mappings(result.json()["mappings"], "pr_comment.mappings.jsonl.gz")
 
 # RESULT:
 """
@@ -0,0 +1,358 @@
+"""
+Incremental, parallel scans of the terraform tree.
+
+`scan()` finds the `.tf` files under the scanned roots (honouring
+`.boostignore`), hashes their content and only hands the scanner those whose
+hash differs from the one recorded with their findings in the scan state, so
+committed and uncommitted edits, reverts and new files all count.  Files are
+sharded per provider directory (`terraform/aws`, `terraform/azure`, ...) into
+batches run concurrently through an `Executor`, one process per core by
+default.  Each shard's output is parsed as it is written by a `json_stream`
+parser (SARIF results by default), so a large or minified document is never
+buffered whole.  Findings are attributed to files with `file_of` (for SARIF,
+the percent-decoded artifact URI, relative or absolute), cached per file in
+the state, and merged with the cached findings of unchanged files into one
+report sorted by file, so the same tree always yields the same report.
+
+A missing or unreadable state or a different scanner command make for a full
+scan.  A finding for a file the scanner was not given fails the scan rather
+than being dropped, and so does output that does not parse: empty output only
+means "no findings" with exit status 0.  No state is written for a failed
+scan.
+
+    python -m boost.core.scan_driver --state .boost-scan.json -- \\
+        scanner --format sarif
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from contextlib import aclosing
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence, Union
+from urllib.parse import unquote, urlsplit
+
+from boost.core.boostignore import IgnoreMatcher, walk
+from boost.core.cache_files import atomic_write
+from boost.core.errors import BoostExecutionError
+from boost.core.json_stream import (
+    SARIF_RESULTS,
+    JSONArrayParser,
+    NDJSONParser,
+    Parser,
+    parse_stage,
+)
+from boost.core.subprocess import Command, Executor, default_concurrency
+
+__all__ = [
+    "ScanState",
+    "content_hash",
+    "discover",
+    "scan",
+    "shard",
+]
+
+
+DEFAULT_ROOTS = ("terraform",)
+
+DEFAULT_SUFFIXES = (".tf",)
+
+# Files handed to one scanner process.
+DEFAULT_SHARD_SIZE = 64
+
+# Scanners commonly exit 1 when they report findings.
+DEFAULT_OK_RETURNCODES = (0, 1)
+
+STATE_VERSION = 2
+
+StrPath = Union[str, "os.PathLike[str]"]
+Finding = dict[str, Any]
+
+
+def sarif_parser() -> JSONArrayParser:
+    return JSONArrayParser(SARIF_RESULTS)
+
+
+def sarif_file(result: Finding) -> str:
+    # The percent-decoded artifact path: absolute for a file:// URI, relative
+    # to the scanner's working directory otherwise.  A `uriBaseId`, usually
+    # %SRCROOT%, is taken to be that directory, the repository.
+    location = result["locations"][0]["physicalLocation"]["artifactLocation"]
+    uri: str = location["uri"]
+    parts = urlsplit(uri)
+
+    if parts.scheme == "file":
+        return unquote(parts.path)
+    if parts.scheme:
+        raise ValueError(f"unsupported artifact URI '{uri}'")
+    return unquote(parts.path)
+
+
+def _relative(repository: Path, path: str) -> Optional[str]:
+    # "repository"-relative with "/" separators, None when outside of it.
+    resolved = Path(os.path.normpath(repository / path))
+    try:
+        return resolved.relative_to(repository).as_posix()
+    except ValueError:
+        return None
+
+
+class _Shard:
+    # One scanner process: its files, and its findings parsed from stdout as
+    # it is written instead of from the whole document once it exits.
+    __slots__ = ("files", "parser", "lines", "findings", "stderr")
+
+    def __init__(self, files: list[str], parser: Parser) -> None:
+        self.files = files
+        self.parser = parser
+        self.lines = isinstance(parser, NDJSONParser)
+        self.findings: list[Finding] = []
+        self.stderr: list[bytes] = []
+
+    async def add(self, finding: Finding) -> None:
+        self.findings.append(finding)
+
+    def command(self, scanner: Sequence[str], repository: Path) -> Command:
+        return Command(
+            scanner[0],
+            *scanner[1:],
+            *self.files,
+            cwd=str(repository),
+            check=False,
+            verbose=False,
+            mode="lines" if self.lines else "chunks",
+            stdout_cb=parse_stage(self.parser, self.add),
+            # The mode applies to stderr too: batches of lines or raw chunks.
+            stderr_cb=self.stderr.extend if self.lines else self.stderr.append,
+        )
+
+    def close(self) -> list[Finding]:
+        self.findings.extend(self.parser.close())
+        return self.findings
+
+    def error_lines(self) -> list[str]:
+        separator = b"\n" if self.lines else b""
+        return str(separator.join(self.stderr), "utf-8", "replace").splitlines()
+
+
+class ScanState:
+    def __init__(
+            self,
+            scanner: Optional[str] = None,
+            files: Optional[dict[str, dict[str, Any]]] = None,
+    ) -> None:
+        self.scanner = scanner
+        # path -> {"hash": content hash, "findings": [...]}
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, path: StrPath) -> "ScanState":
+        try:
+            state = json.loads(Path(path).read_bytes())
+            if state["version"] != STATE_VERSION:
+                return cls()
+            return cls(state["scanner"], state["files"])
+        except (FileNotFoundError, ValueError, KeyError):
+            return cls()
+
+    def save(self, path: StrPath) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        encoded = json.dumps(
+            {
+                "version": STATE_VERSION,
+                "scanner": self.scanner,
+                "files": self.files,
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+        atomic_write(path, encoded)
+
+
+def content_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def discover(
+        repository: Path,
+        roots: Sequence[str] = DEFAULT_ROOTS,
+        suffixes: Sequence[str] = DEFAULT_SUFFIXES,
+) -> list[str]:
+    matcher = IgnoreMatcher.load(repository / ".boostignore")
+    return sorted(
+        path
+        for root in roots
+        for path in walk(repository, matcher, start=root)
+        if path.endswith(tuple(suffixes))
+    )
+
+
+def _provider(path: str) -> str:
+    # "terraform/aws/s3.tf" -> "terraform/aws"
+    return "/".join(path.split("/")[:2])
+
+
+def shard(files: Iterable[str], size: int = DEFAULT_SHARD_SIZE) -> list[list[str]]:
+    shards = []
+
+    for _, group in groupby(sorted(files), key=_provider):
+        batch = list(group)
+        shards.extend(batch[i:i + size] for i in range(0, len(batch), size))
+
+    return shards
+
+
+async def scan(
+        scanner: Sequence[str],
+        repository: StrPath = ".",
+        state_path: Optional[StrPath] = None,
+        roots: Sequence[str] = DEFAULT_ROOTS,
+        suffixes: Sequence[str] = DEFAULT_SUFFIXES,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        concurrency: Optional[int] = None,
+        parser: Callable[[], Parser] = sarif_parser,
+        file_of: Callable[[Finding], str] = sarif_file,
+        ok_returncodes: Iterable[int] = DEFAULT_OK_RETURNCODES,
+) -> dict[str, Any]:
+    repository = Path(repository).resolve()
+    state = ScanState.load(state_path) if state_path else ScanState()
+    digest = hashlib.sha256(json.dumps(list(scanner)).encode("utf-8")).hexdigest()
+    ok_returncodes = set(ok_returncodes)
+
+    files = discover(repository, roots, suffixes)
+    # Keyed on content rather than on a commit: edits, reverts, checkouts and
+    # untracked files all change exactly the hashes of the files they touch.
+    hashes = {path: content_hash(repository / path) for path in files}
+
+    if state.scanner != digest:
+        state.files = {}
+
+    pending = [
+        path for path in files if state.files.get(path, {}).get("hash") != hashes[path]
+    ]
+
+    jobs = [_Shard(batch, parser()) for batch in shard(pending, shard_size)]
+    shards = {job.command(scanner, repository): job for job in jobs}
+    executor = Executor(concurrency or default_concurrency())
+
+    # Closed on the way out, so a failure cancels the other shards here rather
+    # than whenever the generator is collected.
+    async with aclosing(executor.run(shards, fail_fast=True)) as finished:
+        async for command in finished:
+            result = command.result
+            assert result is not None
+            job = shards[command]
+
+            if result.returncode not in ok_returncodes:
+                result.stderr = job.error_lines()
+                raise BoostExecutionError(
+                    f"command '{command.command} {command.args}' exited with non-zero "
+                    f"({result.returncode}) exit status",
+                    process=result,
+                )
+
+            found: dict[str, list[Finding]] = {path: [] for path in job.files}
+            unknown: set[str] = set()
+
+            # A scanner given files it has nothing to say about may print
+            # nothing at all, but only a clean exit says so: a crash can exit
+            # with a code that otherwise means "findings", and caching its
+            # empty output would hide those findings until the files change.
+            if result.returncode == 0 and not result.metrics.stdout_bytes:
+                findings = []
+            elif not result.metrics.stdout_bytes:
+                result.stderr = job.error_lines()
+                raise BoostExecutionError(
+                    f"command '{command.command} {command.args}' exited with "
+                    f"{result.returncode} without writing any findings",
+                    process=result,
+                )
+            else:
+                try:
+                    findings = job.close()
+                except ValueError as e:
+                    result.stderr = job.error_lines()
+                    raise BoostExecutionError(
+                        f"command '{command.command} {command.args}' wrote "
+                        f"unparseable findings: {e}",
+                        process=result,
+                    ) from e
+
+            for finding in findings:
+                location = file_of(finding)
+                path = _relative(repository, location)
+                if path in found:
+                    found[path].append(finding)
+                else:
+                    unknown.add(location)
+
+            # Findings are cached per scanned file: one matching none of them
+            # would be lost on the next incremental scan.
+            if unknown:
+                raise BoostExecutionError(
+                    f"command '{command.command} {command.args}' reported findings "
+                    f"for files it was not given: {', '.join(sorted(unknown))}",
+                    process=result,
+                )
+
+            for path, findings in found.items():
+                state.files[path] = {"hash": hashes[path], "findings": findings}
+
+    # Drops files deleted or newly ignored since the last scan.
+    state.files = {path: state.files[path] for path in files}
+    state.scanner = digest
+
+    if state_path:
+        state.save(state_path)
+
+    return {
+        "files": len(files),
+        "scanned": len(pending),
+        "findings": [
+            finding
+            for path in files
+            for finding in sorted(
+                state.files[path]["findings"], key=lambda f: json.dumps(f, sort_keys=True)
+            )
+        ],
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("scanner", nargs="+", help="scanner command, the files are appended")
+    parser.add_argument("--repository", default=".")
+    parser.add_argument("--state")
+    parser.add_argument("--output")
+    parser.add_argument("--root", action="append", dest="roots")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--concurrency", type=int)
+    options = parser.parse_args(argv)
+
+    report = asyncio.run(
+        scan(
+            options.scanner,
+            repository=options.repository,
+            state_path=options.state,
+            roots=options.roots or DEFAULT_ROOTS,
+            shard_size=options.shard_size,
+            concurrency=options.concurrency,
+        )
+    )
+    encoded = json.dumps(report, indent=2, sort_keys=True)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(encoded + "\n")
+    else:
+        print(encoded)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Process spawn backends for `execute`.
+
+The default "asyncio" backend goes through `asyncio.create_subprocess_exec`.
+The "posix_spawn" backend launches with `os.posix_spawnp`, which never copies
+the parent's page tables, and waits for the child through a pidfd registered
+on the event loop (or a waiter thread where pidfds are unavailable).  As it
+reaps the child itself with `os.wait4`, it also reports the child's exact
+resource usage.  Options posix_spawn cannot honour (`cwd`, `preexec_fn`, ...)
+make it fall back to the asyncio backend.
+"""
+
+import asyncio
+import os
+import signal
+from typing import IO, Any, Awaitable, Callable, Optional, Union
+
+__all__ = [
+    "BACKENDS",
+    "SpawnedProcess",
+    "posix_spawn_exec",
+    "set_default_backend",
+]
+
+
+SpawnBackend = Callable[..., Awaitable[Any]]
+
+PIPE = asyncio.subprocess.PIPE
+
+# Keyword arguments the posix_spawn backend understands, mapped onto the
+# names os.posix_spawnp uses.
+SUPPORTED_OPTIONS = {"env": "env", "start_new_session": "setsid"}
+
+
+class SpawnedProcess:
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self.rusage: Optional[Any] = None
+        self.stdin: Optional[asyncio.StreamWriter] = None
+        self.stdout: Optional[asyncio.StreamReader] = None
+        self.stderr: Optional[asyncio.StreamReader] = None
+        self._pidfd: Optional[int] = None
+        self._exited: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._exited)
+
+    def send_signal(self, signum: int) -> None:
+        if self.returncode is not None:
+            return
+        if self._pidfd is not None:
+            signal.pidfd_send_signal(self._pidfd, signum)
+        else:
+            os.kill(self.pid, signum)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        try:
+            self._pidfd = os.pidfd_open(self.pid)
+        except (AttributeError, OSError):
+            # No pidfd support: block on the child in a worker thread instead.
+            waiter = loop.run_in_executor(None, os.wait4, self.pid, 0)
+            waiter.add_done_callback(lambda done: self._reaped(*done.result()))
+            return
+
+        loop.add_reader(self._pidfd, self._poll)
+
+    def _poll(self) -> None:
+        pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+        if pid:
+            asyncio.get_running_loop().remove_reader(self._pidfd)
+            self._reaped(pid, status, rusage)
+
+    def _reaped(self, pid: int, status: int, rusage: Any) -> None:
+        self.returncode = os.waitstatus_to_exitcode(status)
+        self.rusage = rusage
+
+        if self._pidfd is not None:
+            os.close(self._pidfd)
+            self._pidfd = None
+
+        if not self._exited.done():
+            self._exited.set_result(self.returncode)
+
+
+async def asyncio_exec(command: str, *args: str, **kwargs: Any) -> Any:
+    return await asyncio.create_subprocess_exec(command, *args, **kwargs)
+
+
+async def posix_spawn_exec(
+        command: str,
+        *args: str,
+        stdin: Union[None, int, IO[Any]] = None,
+        stdout: Union[None, int, IO[Any]] = None,
+        stderr: Union[None, int, IO[Any]] = None,
+        limit: int = 2**16,
+        **kwargs: Any,
+) -> Any:
+    if not set(kwargs) <= set(SUPPORTED_OPTIONS):
+        return await asyncio_exec(
+            command,
+            *args,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+            limit=limit,
+            **kwargs,
+        )
+
+    options = {SUPPORTED_OPTIONS[name]: value for name, value in kwargs.items()}
+    env = options.pop("env", None)
+    env = os.environ if env is None else env
+    file_actions = []
+    parent_ends: list[tuple[int, int]] = []
+    child_ends: list[int] = []
+
+    try:
+        for target, source in enumerate((stdin, stdout, stderr)):
+            if source == PIPE:
+                # os.pipe() descriptors are close-on-exec, only the dup2'ed
+                # copies survive into the child.
+                read, write = os.pipe()
+                child, parent = (read, write) if target == 0 else (write, read)
+                parent_ends.append((target, parent))
+                child_ends.append(child)
+                file_actions.append((os.POSIX_SPAWN_DUP2, child, target))
+            elif isinstance(source, int) and source >= 0:
+                file_actions.append((os.POSIX_SPAWN_DUP2, source, target))
+            elif hasattr(source, "fileno"):
+                file_actions.append((os.POSIX_SPAWN_DUP2, source.fileno(), target))
+
+        pid = os.posix_spawnp(
+            command,
+            [command, *args],
+            env,
+            file_actions=file_actions,
+            **options,
+        )
+    except BaseException:
+        for _, fd in parent_ends:
+            os.close(fd)
+        raise
+    finally:
+        for fd in child_ends:
+            os.close(fd)
+
+    loop = asyncio.get_running_loop()
+    process = SpawnedProcess(pid)
+    process._watch()
+
+    for target, fd in parent_ends:
+        if target == 0:
+            transport, protocol = await loop.connect_write_pipe(
+                lambda: asyncio.streams.FlowControlMixin(loop=loop),
+                os.fdopen(fd, "wb", buffering=0),
+            )
+            process.stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+        else:
+            reader = asyncio.StreamReader(limit=limit, loop=loop)
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader, loop=loop),
+                os.fdopen(fd, "rb", buffering=0),
+            )
+            if target == 1:
+                process.stdout = reader
+            else:
+                process.stderr = reader
+
+    return process
+
+
+BACKENDS: dict[str, SpawnBackend] = {
+    "asyncio": asyncio_exec,
+    "posix_spawn": posix_spawn_exec,
+}
+
+default_backend = "asyncio"
+
+
+def set_default_backend(name: str) -> None:
+    global default_backend
+
+    if name not in BACKENDS:
+        raise ValueError(f"unknown spawn backend '{name}'")
+
+    default_backend = name
+
+
+def get_backend(backend: Union[None, str, SpawnBackend]) -> SpawnBackend:
+    if backend is None:
+        backend = default_backend
+    if isinstance(backend, str):
+        return BACKENDS[backend]
+    return backend
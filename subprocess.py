@@ -1,17 +1,51 @@
 import asyncio
+import heapq
+import inspect
 import logging
+import mmap
+import os
+import tempfile
+import time
+import weakref
+from array import array
+from itertools import accumulate
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional
+from typing import (
+    IO,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Literal,
+    Optional,
+    Sequence,
+    Union,
+    overload,
+)
 
 from boost.core.errors import BoostExecutionError, BoostRuntimeError
 from boost.core.globals import (
     BOOST_EXEC_DEFAULT_TIMEOUT,
     BOOST_EXEC_SUBPROCESS_BUFFER,
 )
+from boost.core.output_logging import OutputLog, OutputLogPolicy
+from boost.core.spawn import SpawnBackend, get_backend
 
 __all__ = [
+    "Command",
+    "Executor",
+    "OutputBuffer",
+    "OutputStream",
+    "ProcessMetrics",
+    "SpilledLine",
+    "add_observer",
     "execute",
+    "execute_many",
     "output",
+    "remove_observer",
+    "stream",
 ]
 
 
@@ -19,27 +53,406 @@ logger = logging.getLogger("boost.command")
 output_logger = logging.getLogger("boost.command.stdout")
 error_logger = logging.getLogger("boost.command.stderr")
 
+# "text": one decoded, stripped str per callback (the historical behaviour).
+# "lines": batches of raw byte lines (without the trailing newline).
+# "chunks": raw bytes exactly as read from the pipe.
+# The byte modes never decode; `output(encoding=...)` decodes once at the end.
+OutputMode = Literal["text", "lines", "chunks"]
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# What to do with a line longer than `limit`:
+# "error": abort with BoostExecutionError (the historical behaviour).
+# "split": deliver it as consecutive pieces of at most ~limit bytes.
+# "spill": write it to an anonymous temporary file, deliver a SpilledLine.
+Overflow = Literal["error", "split", "spill"]
+
+_LIMIT_OVERRUN = "Separator is found, but chunk is longer than limit"
+_LIMIT_OVERRUNS = (
+    _LIMIT_OVERRUN,
+    "Separator is not found, and chunk exceed the limit",
+)
+
+# Default flush deadline for batched text callbacks (see execute(batch_lines=)).
+DEFAULT_BATCH_INTERVAL = 0.05
+
+# Lines batched for output()'s own collectors.
+OUTPUT_BATCH_LINES = 4096
+
+# Lines (or line batches in "lines" mode) buffered ahead of a stream() consumer
+# before the reader stops draining the pipe and the child blocks on write.
+DEFAULT_STREAM_QUEUE = 1024
+
+# Bytes queued on a child's stdin before write_stream waits for it to drain.
+STDIN_HIGH_WATER = 256 * 1024
+
+StdinChunk = Union[str, bytes, bytearray, memoryview]
+StdinSource = Union[
+    bytes,
+    bytearray,
+    memoryview,
+    Iterable[StdinChunk],
+    AsyncIterable[StdinChunk],
+]
+
+# stdin, stdout and stderr pipes plus headroom for the child watcher.
+FDS_PER_PROCESS = 8
+
+
+class _Lines:
+    # Lines packed back to back in one bytearray; ends[i] is the offset just
+    # past line i. Lines dropped from the front are skipped via `first` and
+    # only physically removed once they make up half of the buffer.
+    __slots__ = ("data", "ends", "first")
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.ends = array("Q")
+        self.first = 0
+
+    def __len__(self) -> int:
+        return len(self.ends) - self.first
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) - self.start(0)
+
+    def start(self, index: int) -> int:
+        index += self.first
+        return self.ends[index - 1] if index else 0
+
+    def view(self, index: int) -> memoryview:
+        return memoryview(self.data)[self.start(index):self.ends[self.first + index]]
+
+    def push(self, line: bytes) -> None:
+        self.data += line
+        self.ends.append(len(self.data))
+
+    def extend(self, lines: list[bytes]) -> None:
+        ends = accumulate(map(len, lines), initial=len(self.data))
+        next(ends)
+        self.ends.extend(ends)
+        self.data += b"".join(lines)
+
+    def popleft(self) -> None:
+        self.first += 1
+
+        if self.first * 2 >= len(self.ends):
+            offset = self.start(0)
+            del self.data[:offset]
+            self.ends = array("Q", (end - offset for end in self.ends[self.first:]))
+            self.first = 0
+
+
+class OutputBuffer(Sequence[str]):
+    # A read-only list of str backed by _Lines, decoded on access. With
+    # head_limit and/or tail_limit (bytes) only the first and last lines of
+    # the output are kept; `omitted` counts the lines dropped in between.
+    __slots__ = ("encoding", "head_limit", "tail_limit", "omitted", "_head", "_tail")
+
+    def __init__(
+            self,
+            lines: Iterable[Union[str, bytes]] = (),
+            head_limit: Optional[int] = None,
+            tail_limit: Optional[int] = None,
+            encoding: str = "utf-8",
+    ) -> None:
+        self.encoding = encoding
+        self.head_limit = head_limit
+        self.tail_limit = tail_limit
+        self.omitted = 0
+        self._head = _Lines()
+        self._tail = _Lines()
+
+        if head_limit is None and tail_limit is not None:
+            self.head_limit = 0
+
+        self.extend(lines)
+
+    def append(self, line: Union[str, bytes]) -> None:
+        if isinstance(line, str):
+            line = line.encode(self.encoding)
+
+        head = self._head
+
+        # Once a line went past the head, later lines never go back into it,
+        # even when they would fit: the head stays a prefix of the output.
+        if self.head_limit is None or (
+                not self._tail
+                and not self.omitted
+                and head.nbytes + len(line) <= self.head_limit
+        ):
+            head.push(line)
+            return
+
+        if not self.tail_limit:
+            self.omitted += 1
+            return
+
+        tail = self._tail
+        tail.push(line)
+
+        while len(tail) > 1 and tail.nbytes > self.tail_limit:
+            tail.popleft()
+            self.omitted += 1
+
+    def extend(self, lines: Iterable[Union[str, bytes]]) -> None:
+        if self.head_limit is None and isinstance(lines, list) and lines:
+            if isinstance(lines[0], str):
+                lines = [line.encode(self.encoding) for line in lines]
+            self._head.extend(lines)
+            return
+
+        for line in lines:
+            self.append(line)
+
+    def view(self, index: int) -> memoryview:
+        head = len(self._head)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("output line index out of range")
+        if index < head:
+            return self._head.view(index)
+        return self._tail.view(index - head)
+
+    @property
+    def nbytes(self) -> int:
+        return self._head.nbytes + self._tail.nbytes
+
+    def __len__(self) -> int:
+        return len(self._head) + len(self._tail)
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]:
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, list[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return str(self.view(index), self.encoding, errors="replace")
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, OutputBuffer)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return (
+            f"OutputBuffer(lines={len(self)}, bytes={self.nbytes}, "
+            f"omitted={self.omitted})"
+        )
+
+
+Output = Union[list[str], list[bytes], OutputBuffer]
+
+
+class ProcessMetrics:
+    # Times are in seconds, peak_rss in bytes. Backends that reap the child
+    # with wait4 (spawn="posix_spawn") report the child's own CPU times and
+    # peak RSS. The default asyncio backend reaps in its child watcher, so
+    # they come from RUSAGE_CHILDREN instead: CPU times are deltas, only
+    # kept when no other child started or exited meanwhile, and peak_rss is
+    # the largest child this process has ever reaped. It is therefore only
+    # known when this child set a new high, and is None for any process that
+    # runs after a larger one, even alone. Use spawn="posix_spawn" when the
+    # peak RSS of every process is needed.
+    __slots__ = (
+        "spawn_latency",
+        "wall_time",
+        "user_time",
+        "system_time",
+        "peak_rss",
+        "stdout_bytes",
+        "stdout_lines",
+        "stderr_bytes",
+        "stderr_lines",
+        "stdout_cb_time",
+        "stderr_cb_time",
+    )
+
+    def __init__(self) -> None:
+        self.spawn_latency = 0.0
+        self.wall_time = 0.0
+        self.user_time: Optional[float] = None
+        self.system_time: Optional[float] = None
+        self.peak_rss: Optional[int] = None
+        self.stdout_bytes = 0
+        self.stdout_lines = 0
+        self.stderr_bytes = 0
+        self.stderr_lines = 0
+        self.stdout_cb_time = 0.0
+        self.stderr_cb_time = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"ProcessMetrics({fields})"
+
 
 class CompletedProcess:
+    __slots__ = ("command", "args", "returncode", "stdout", "stderr", "metrics")
+
     def __init__(
             self,
             command: str,
             args: tuple[str, ...],
             returncode: Optional[int] = 0,
-            stdout: Optional[list[str]] = None,
-            stderr: Optional[list[str]] = None,
+            stdout: Optional[Output] = None,
+            stderr: Optional[Output] = None,
     ) -> None:
         self.command = command
         self.args = args
         self.returncode = returncode
-        self.stdout = stdout or []
-        self.stderr = stderr or []
+        self.stdout = [] if stdout is None else stdout
+        self.stderr = [] if stderr is None else stderr
+        self.metrics = ProcessMetrics()
+
+
+Observer = Callable[[CompletedProcess], None]
+
+observers: list[Observer] = []
+
+
+def add_observer(observer: Observer) -> None:
+    observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    observers.remove(observer)
+
+
+def _notify(result: CompletedProcess, on_complete: Optional[Observer]) -> None:
+    for observer in (*observers, *([on_complete] if on_complete else [])):
+        try:
+            observer(result)
+        except Exception:
+            logger.exception("process observer %r failed", observer)
+
+
+class _Usage:
+    # RUSAGE_CHILDREN only grows when a child is reaped, so a delta belongs to
+    # a single child when no other child started or exited in its lifetime.
+    # Every start and finish bumps the generation to detect that.
+    generation = 0
+
+    def __init__(self) -> None:
+        _Usage.generation += 1
+        self.generation = _Usage.generation
+        self.before = _children_usage()
+
+    def finish(self, metrics: ProcessMetrics) -> None:
+        after = _children_usage()
+        isolated = _Usage.generation == self.generation
+        _Usage.generation += 1
+
+        if not (isolated and self.before and after):
+            return
+
+        metrics.user_time = after.ru_utime - self.before.ru_utime
+        metrics.system_time = after.ru_stime - self.before.ru_stime
+
+        # ru_maxrss is the largest child reaped so far, in KiB on Linux, not
+        # a sum: it only identifies this child's peak when it sets a new high.
+        if after.ru_maxrss > self.before.ru_maxrss:
+            metrics.peak_rss = after.ru_maxrss * 1024
+
+
+def _children_usage() -> Any:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+class SpilledLine:
+    __slots__ = ("file", "size")
+
+    def __init__(self) -> None:
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self.file.write(data)
+        self.size += len(data)
+
+    def finish(self) -> "SpilledLine":
+        self.file.flush()
+        self.file.seek(0)
+        return self
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def mmap(self) -> mmap.mmap:
+        return mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"SpilledLine(size={self.size})"
+
+
+def _utf8_boundary(data: Union[bytearray, memoryview], end: int) -> int:
+    # Step back over continuation bytes so a split never cuts a character.
+    start = end
+    while start > 0 and end - start < 4 and data[start] & 0xC0 == 0x80:
+        start -= 1
+    return start or end
+
+
+def _fit(lines: list[bytes], limit: int, overflow: Overflow) -> list[Any]:
+    # Complete lines longer than `limit`, split or spilled as the tail is.
+    if overflow == "error":
+        raise ValueError(_LIMIT_OVERRUN)
+
+    fitted: list[Any] = []
+
+    for line in lines:
+        if len(line) <= limit:
+            fitted.append(line)
+        elif overflow == "spill":
+            spill = SpilledLine()
+            spill.write(line)
+            fitted.append(spill.finish())
+        else:
+            view = memoryview(line)
+            while len(view) > limit:
+                end = _utf8_boundary(view, limit)
+                fitted.append(bytes(view[:end]))
+                view = view[end:]
+            fitted.append(bytes(view))
+
+    return fitted
+
+
+class _Counter:
+    __slots__ = ("bytes", "lines")
+
+    def __init__(self) -> None:
+        self.bytes = 0
+        self.lines = 0
 
 
 async def read_stream(
         stream: Optional[asyncio.StreamReader],
         callback: Callable[[str], Awaitable[None]],
         strip_with: Callable[[str], str],
+        counter: Optional[_Counter] = None,
 ) -> None:
     if not stream:
         return
@@ -50,6 +463,10 @@ async def read_stream(
         if not line:
             break
 
+        if counter:
+            counter.bytes += len(line)
+            counter.lines += 1
+
         line = str(line, "utf-8")
 
         if strip_with:
@@ -58,19 +475,275 @@ async def read_stream(
         await callback(line)
 
 
+async def read_chunks(
+        stream: Optional[asyncio.StreamReader],
+        callback: Callable[[bytes], Awaitable[None]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        counter: Optional[_Counter] = None,
+) -> None:
+    if not stream:
+        return
+
+    while True:
+        chunk = await stream.read(chunk_size)
+
+        if not chunk:
+            break
+
+        if counter:
+            counter.bytes += len(chunk)
+            counter.lines += chunk.count(b"\n")
+
+        await callback(chunk)
+
+
+async def read_lines(
+        stream: Optional[asyncio.StreamReader],
+        callback: Callable[[list[bytes]], Awaitable[None]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        limit: int = BOOST_EXEC_SUBPROCESS_BUFFER,
+        overflow: Overflow = "error",
+        counter: Optional[_Counter] = None,
+) -> None:
+    if not stream:
+        return
+
+    pending = bytearray()
+    spill: Optional[SpilledLine] = None
+
+    while True:
+        chunk = await stream.read(chunk_size)
+
+        if not chunk:
+            break
+
+        if counter:
+            counter.bytes += len(chunk)
+            counter.lines += chunk.count(b"\n")
+
+        if spill:
+            end = chunk.find(b"\n")
+
+            if end < 0:
+                spill.write(chunk)
+                continue
+
+            spill.write(memoryview(chunk)[:end])
+            await callback([spill.finish()])
+            spill = None
+            chunk = chunk[end + 1:]
+
+        # bytes.split runs in C and hands back every complete line of the
+        # chunk in one call; only the incomplete tail is copied into pending.
+        lines = chunk.split(b"\n")
+        tail = memoryview(lines.pop())
+
+        if lines:
+            if pending:
+                pending += lines[0]
+                lines[0] = bytes(pending)
+                pending.clear()
+            if max(map(len, lines)) > limit:
+                lines = _fit(lines, limit, overflow)
+            await callback(lines)
+
+        pending += tail
+
+        if len(pending) <= limit:
+            continue
+
+        if overflow == "split":
+            while len(pending) > limit:
+                end = _utf8_boundary(pending, limit)
+                await callback([bytes(pending[:end])])
+                del pending[:end]
+        elif overflow == "spill":
+            spill = SpilledLine()
+            spill.write(pending)
+            pending.clear()
+        else:
+            raise ValueError(_LIMIT_OVERRUN)
+
+    if spill:
+        await callback([spill.finish()])
+
+    if pending:
+        await callback([bytes(pending)])
+
+
+async def read_text(
+        stream: Optional[asyncio.StreamReader],
+        callback: Callable[[Any], Awaitable[None]],
+        strip_with: Callable[[str], str],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        limit: int = BOOST_EXEC_SUBPROCESS_BUFFER,
+        overflow: Overflow = "error",
+        counter: Optional[_Counter] = None,
+) -> None:
+    async def each(lines: list[Any]) -> None:
+        for line in lines:
+            if not isinstance(line, SpilledLine):
+                line = str(line, "utf-8")
+
+                if strip_with:
+                    line = strip_with(line)
+
+            await callback(line)
+
+    await read_lines(stream, each, chunk_size, limit, overflow, counter)
+
+
+class _Batcher:
+    __slots__ = ("callback", "size", "interval", "lines", "started")
+
+    def __init__(
+            self,
+            callback: Callable[[list[Any]], Awaitable[None]],
+            size: int,
+            interval: float,
+    ) -> None:
+        self.callback = callback
+        self.size = size
+        self.interval = interval
+        self.lines: list[Any] = []
+        self.started = 0.0
+
+    def add(self, lines: list[Any]) -> None:
+        if not self.lines:
+            self.started = time.monotonic()
+        self.lines.extend(lines)
+
+    def remaining(self) -> float:
+        return self.started + self.interval - time.monotonic()
+
+    def due(self) -> bool:
+        return len(self.lines) >= self.size or self.remaining() <= 0
+
+    async def flush(self) -> None:
+        if self.lines:
+            lines, self.lines = self.lines, []
+            await self.callback(lines)
+
+
+class _DeadlineReader:
+    # Wraps a StreamReader so a pending batch is flushed when no new output
+    # arrives before its deadline, instead of waiting for the next read.
+    __slots__ = ("stream", "batcher")
+
+    def __init__(self, stream: asyncio.StreamReader, batcher: _Batcher) -> None:
+        self.stream = stream
+        self.batcher = batcher
+
+    async def read(self, size: int) -> bytes:
+        if self.batcher.lines:
+            try:
+                return await asyncio.wait_for(
+                    self.stream.read(size), max(0, self.batcher.remaining())
+                )
+            except asyncio.TimeoutError:
+                await self.batcher.flush()
+        return await self.stream.read(size)
+
+
+async def read_text_batches(
+        stream: Optional[asyncio.StreamReader],
+        callback: Callable[[list[Any]], Awaitable[None]],
+        strip_with: Callable[[str], str],
+        batch_lines: int,
+        batch_interval: float = DEFAULT_BATCH_INTERVAL,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        limit: int = BOOST_EXEC_SUBPROCESS_BUFFER,
+        overflow: Overflow = "error",
+        counter: Optional[_Counter] = None,
+) -> None:
+    if not stream:
+        return
+
+    batcher = _Batcher(callback, batch_lines, batch_interval)
+
+    async def each(lines: list[Any]) -> None:
+        if overflow == "spill":
+            text = [
+                line if isinstance(line, SpilledLine) else str(line, "utf-8")
+                for line in lines
+            ]
+        else:
+            # One decode and one split per chunk instead of one per line.
+            text = str(b"\n".join(lines), "utf-8").split("\n")
+
+        if strip_with:
+            text = [
+                line if isinstance(line, SpilledLine) else strip_with(line)
+                for line in text
+            ]
+
+        batcher.add(text)
+
+        if batcher.due():
+            await batcher.flush()
+
+    reader: Any = _DeadlineReader(stream, batcher)
+    await read_lines(reader, each, chunk_size, limit, overflow, counter)
+    await batcher.flush()
+
+
 async def write_stream(
         stream: Optional[asyncio.StreamWriter],
-        values: Optional[Iterable[str]],
+        values: Optional[StdinSource],
+        high_water: int = STDIN_HIGH_WATER,
 ) -> None:
-    if not stream or not values:
+    if not stream:
         return
 
-    for line in values:
-        stream.write(bytes(line, "utf-8"))
-        await stream.drain()
+    try:
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            stream.write(values)
+            await stream.drain()
+        elif values is not None:
+            await _write_batched(stream, values, high_water)
+    except (BrokenPipeError, ConnectionResetError):
+        # The child exited without reading all of its input; its exit status
+        # tells the caller what happened.
+        pass
+
     stream.close()
 
 
+async def _write_batched(
+        stream: asyncio.StreamWriter,
+        values: Union[Iterable[StdinChunk], AsyncIterable[StdinChunk]],
+        high_water: int,
+) -> None:
+    batch: list[Union[bytes, bytearray, memoryview]] = []
+    size = 0
+
+    async def flush() -> None:
+        nonlocal size
+        stream.writelines(batch)
+        batch.clear()
+        size = 0
+        await stream.drain()
+
+    if isinstance(values, AsyncIterable):
+        async for value in values:
+            if isinstance(value, str):
+                value = bytes(value, "utf-8")
+            batch.append(value)
+            size += len(value)
+            if size >= high_water:
+                await flush()
+    else:
+        for value in values:
+            if isinstance(value, str):
+                value = bytes(value, "utf-8")
+            batch.append(value)
+            size += len(value)
+            if size >= high_water:
+                await flush()
+
+    await flush()
+
+
 async def execute(
         command: str,
         *args: str,
@@ -80,54 +753,122 @@ async def execute(
         error_logger: logging.Logger = error_logger,
         output_logger: logging.Logger = output_logger,
         strip_with: Callable[[str], str] = str.strip,
-        stderr_cb: Optional[Callable[[str], Awaitable[None]]] = None,
-        stdin_iter: Optional[Iterator[str]] = None,
-        stdout_cb: Optional[Callable[[str], Awaitable[None]]] = None,
+        stderr_cb: Optional[Callable[[Any], Any]] = None,
+        stdin_iter: Optional[StdinSource] = None,
+        stdin_file: Optional[Union[int, str, os.PathLike[str]]] = None,
+        stdout_cb: Optional[Callable[[Any], Any]] = None,
         timeout: Optional[int] = BOOST_EXEC_DEFAULT_TIMEOUT,
         verbose: Optional[bool] = None,
+        mode: OutputMode = "text",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        overflow: Overflow = "error",
+        on_complete: Optional[Observer] = None,
+        log_policy: Optional[OutputLogPolicy] = None,
+        spawn: Union[None, str, SpawnBackend] = None,
+        batch_lines: Optional[int] = None,
+        batch_interval: float = DEFAULT_BATCH_INTERVAL,
         **kwargs: Any,
 ) -> CompletedProcess:
     result = CompletedProcess(command, args, -1)
+    metrics = result.metrics
+    stdout_counter = _Counter()
+    stderr_counter = _Counter()
 
     if verbose is None:
         verbose = output_logger.level <= logging.DEBUG
 
-    async def read_output(line: str) -> None:
-        if verbose:
-            if len(line) > 1024:
-                output_logger.debug(line[0:1021] + "...")
-            else:
-                output_logger.debug(line)
+    display = Path(command).name
+    stdout_log = OutputLog(output_logger, display, log_policy) if verbose else None
+    stderr_log = OutputLog(error_logger, display, log_policy) if verbose else None
+
+    def reader(
+            stream: Optional[asyncio.StreamReader],
+            callback: Callable[[Any], Awaitable[None]],
+            counter: _Counter,
+    ) -> Awaitable[None]:
+        if mode == "lines":
+            return read_lines(
+                stream, callback, chunk_size, limit, overflow, counter
+            )
+        if mode == "chunks":
+            return read_chunks(stream, callback, chunk_size, counter)
+        if batch_lines:
+            return read_text_batches(
+                stream,
+                callback,
+                strip_with,
+                batch_lines,
+                batch_interval,
+                chunk_size,
+                limit,
+                overflow,
+                counter,
+            )
+        if overflow != "error":
+            return read_text(
+                stream, callback, strip_with, chunk_size, limit, overflow, counter
+            )
+        return read_stream(stream, callback, strip_with, counter)
+
+    async def read_output(line: Any) -> None:
+        if stdout_log:
+            stdout_log.write(line)
 
         if stdout_cb:
-            await stdout_cb(line)
+            started = time.perf_counter()
+            # Plain functions are called directly, skipping a coroutine.
+            if inspect.isawaitable(pending := stdout_cb(line)):
+                await pending
+            metrics.stdout_cb_time += time.perf_counter() - started
 
-    async def read_error(line: str) -> None:
-        if verbose:
-            if len(line) > 1024:
-                error_logger.debug(line[0:1021] + "...")
-            else:
-                error_logger.debug(line)
+    async def read_error(line: Any) -> None:
+        if stderr_log:
+            stderr_log.write(line)
 
         if stderr_cb:
-            await stderr_cb(line)
+            started = time.perf_counter()
+            if inspect.isawaitable(pending := stderr_cb(line)):
+                await pending
+            metrics.stderr_cb_time += time.perf_counter() - started
+
+    subprocess: Any = None
+    stdin: Union[None, int, IO[bytes]] = None
+
+    # A file given as stdin is handed to the child as is: the kernel feeds it
+    # directly and none of its content passes through this process.
+    if isinstance(stdin_file, int):
+        stdin = stdin_file
+    elif stdin_file is not None:
+        stdin = open(stdin_file, "rb")
+    elif stdin_iter is not None:
+        stdin = asyncio.subprocess.PIPE
+
+    usage: Optional[_Usage] = None
+    started = time.perf_counter()
 
     try:
         logger.debug(f"{command}, {' '.join(args)}")
-        subprocess = await asyncio.create_subprocess_exec(
-            command,
-            *args,
-            limit=limit,
-            stdin=None if stdin_iter is None else asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            **kwargs,
-        )
+
+        try:
+            usage = _Usage()
+            subprocess = await get_backend(spawn)(
+                command,
+                *args,
+                limit=limit,
+                stdin=stdin,
+                stderr=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                **kwargs,
+            )
+        finally:
+            if hasattr(stdin, "close"):
+                stdin.close()
+            metrics.spawn_latency = time.perf_counter() - started
 
         await asyncio.wait_for(
             asyncio.gather(
-                read_stream(subprocess.stdout, read_output, strip_with),
-                read_stream(subprocess.stderr, read_error, strip_with),
+                reader(subprocess.stdout, read_output, stdout_counter),
+                reader(subprocess.stderr, read_error, stderr_counter),
                 write_stream(subprocess.stdin, stdin_iter),
                 subprocess.wait(),
             ),
@@ -157,14 +898,49 @@ async def execute(
         ) from e
 
     except ValueError as e:
-        if str(e) == "Separator is found, but chunk is longer than limit":
+        if str(e) in _LIMIT_OVERRUNS:
             result.returncode = subprocess.returncode
             raise BoostExecutionError(
                 f"command '{command}' output exceeded maximum buffer size",
                 process=result,
             ) from e
 
-    result.returncode = subprocess.returncode
+        raise
+
+    else:
+        result.returncode = subprocess.returncode
+
+    finally:
+        # Whatever made the readers stop early (a timeout, cancellation, a
+        # buffer overrun or a callback raising), a child still running would
+        # otherwise block on a full pipe with no one left to read it.
+        if subprocess and subprocess.returncode is None:
+            try:
+                subprocess.kill()
+            except OSError:
+                pass
+
+        metrics.wall_time = time.perf_counter() - started
+        metrics.stdout_bytes = stdout_counter.bytes
+        metrics.stdout_lines = stdout_counter.lines
+        metrics.stderr_bytes = stderr_counter.bytes
+        metrics.stderr_lines = stderr_counter.lines
+
+        if usage:
+            usage.finish(metrics)
+
+        # Backends that reap the child themselves know its exact usage.
+        rusage = getattr(subprocess, "rusage", None)
+        if rusage:
+            metrics.user_time = rusage.ru_utime
+            metrics.system_time = rusage.ru_stime
+            metrics.peak_rss = rusage.ru_maxrss * 1024
+
+        for log in (stdout_log, stderr_log):
+            if log:
+                log.close(failed=result.returncode != 0)
+
+        _notify(result, on_complete)
 
     if check and result.returncode != 0:
         raise BoostExecutionError(
@@ -176,29 +952,331 @@ async def execute(
     return result
 
 
+class Command:
+    def __init__(
+            self,
+            command: str,
+            *args: str,
+            priority: int = 0,
+            timeout: Optional[int] = BOOST_EXEC_DEFAULT_TIMEOUT,
+            **kwargs: Any,
+    ) -> None:
+        self.command = command
+        self.args = args
+        self.priority = priority
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.result: Optional[CompletedProcess] = None
+        # BoostExecutionError, BoostRuntimeError, or anything else the runner
+        # raised (an OSError spawning the command, for instance).
+        self.error: Optional[Exception] = None
+
+
+class Executor:
+    def __init__(
+            self,
+            max_workers: Optional[int] = None,
+            runner: Callable[..., Awaitable[CompletedProcess]] = execute,
+    ) -> None:
+        self.max_workers = max_workers or default_concurrency()
+        self.runner = runner
+        self._slots: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # One semaphore per event loop: a semaphore binds to the first loop
+        # it waits on, and an Executor (default_executor() in particular)
+        # outlives each asyncio.run().
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_workers)
+        return slots
+
+    async def submit(self, command: Command) -> Command:
+        async with self.slots:
+            return await self._run(command)
+
+    async def run(
+            self,
+            commands: Iterable[Command],
+            fail_fast: bool = False,
+    ) -> AsyncIterator[Command]:
+        # Lower priority values run first, ties keep submission order.
+        queue = [(c.priority, i, c) for i, c in enumerate(commands)]
+        heapq.heapify(queue)
+        total = len(queue)
+        finished: asyncio.Queue[Command] = asyncio.Queue()
+        running: set[asyncio.Task[Command]] = set()
+
+        def on_done(task: asyncio.Task[Command]) -> None:
+            self.slots.release()
+            running.discard(task)
+            if not task.cancelled():
+                finished.put_nowait(task.result())
+
+        async def dispatch() -> None:
+            while queue:
+                _, _, command = heapq.heappop(queue)
+                await self.slots.acquire()
+                task = asyncio.create_task(self._run(command))
+                task.add_done_callback(on_done)
+                running.add(task)
+
+        async def next_finished() -> Command:
+            # Waits on the dispatcher too, so an error dispatching is raised
+            # here instead of leaving run() waiting for commands never started.
+            if not dispatcher.done():
+                getter = asyncio.ensure_future(finished.get())
+                try:
+                    await asyncio.wait(
+                        (getter, dispatcher), return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    if not getter.done():
+                        getter.cancel()
+                if getter.done() and not getter.cancelled():
+                    return getter.result()
+            dispatcher.result()
+            return await finished.get()
+
+        dispatcher = asyncio.create_task(dispatch())
+
+        try:
+            for _ in range(total):
+                command = await next_finished()
+
+                if fail_fast and command.error:
+                    raise command.error
+
+                yield command
+        finally:
+            dispatcher.cancel()
+            for task in list(running):
+                task.cancel()
+            await asyncio.gather(dispatcher, *running, return_exceptions=True)
+
+    async def _run(self, command: Command) -> Command:
+        try:
+            command.result = await self.runner(
+                command.command,
+                *command.args,
+                timeout=command.timeout,
+                **command.kwargs,
+            )
+        except BoostExecutionError as error:
+            command.result = error.process
+            command.error = error
+        except Exception as error:
+            # Recorded rather than raised: a task failing in on_done would
+            # never be queued as finished and run() would wait forever.
+            command.error = error
+
+        return command
+
+
+def default_concurrency() -> int:
+    cpus = os.cpu_count() or 1
+
+    try:
+        import resource
+
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError):
+        return cpus
+
+    if soft == resource.RLIM_INFINITY:
+        return cpus
+
+    return max(1, min(cpus, soft // FDS_PER_PROCESS))
+
+
+_executor: Optional[Executor] = None
+
+
+def default_executor() -> Executor:
+    global _executor
+
+    if _executor is None:
+        _executor = Executor()
+
+    return _executor
+
+
+def execute_many(
+        commands: Iterable[Command],
+        concurrency: Optional[int] = None,
+        fail_fast: bool = False,
+) -> AsyncIterator[Command]:
+    executor = Executor(concurrency) if concurrency else default_executor()
+    return executor.run(commands, fail_fast=fail_fast)
+
+
 async def output(
         *args: str,
         combined: bool = False,
+        mode: OutputMode = "text",
+        encoding: Optional[str] = None,
+        compact: bool = False,
+        head_limit: Optional[int] = None,
+        tail_limit: Optional[int] = None,
         **kwargs: Any,
 ) -> CompletedProcess:
-    stdout: list[str] = []
-    stderr: list[str] = stdout if combined else []
+    stdout: Any
+    stderr: Any
+    capped = compact or head_limit is not None or tail_limit is not None
+
+    # Spilled lines stay in their temporary files; reading them back to
+    # store or decode them would undo the spill.
+    if kwargs.get("overflow") == "spill" and (
+            capped or (mode != "text" and encoding)
+    ):
+        raise ValueError(
+            "overflow='spill' cannot be combined with compact capture "
+            "or decoding byte output"
+        )
+
+    if capped:
+        if mode == "chunks":
+            raise ValueError("compact output capture requires line output")
+
+        def buffer() -> OutputBuffer:
+            return OutputBuffer(
+                head_limit=head_limit,
+                tail_limit=tail_limit,
+                encoding=encoding or "utf-8",
+            )
+
+        stdout = buffer()
+        stderr = stdout if combined else buffer()
+    else:
+        stdout = []
+        stderr = stdout if combined else []
 
-    async def collect_output(line: str) -> None:
-        stdout.append(line)
+    # Combined output keeps one callback per line so stdout and stderr lines
+    # interleave as they arrive, not a batch of each at a time.
+    if mode == "text" and not combined:
+        kwargs.setdefault("batch_lines", OUTPUT_BATCH_LINES)
 
-    async def collect_stderr(line: str) -> None:
-        stderr.append(line)
+    if mode == "lines" or kwargs.get("batch_lines"):
+        collect_output = stdout.extend
+        collect_stderr = stderr.extend
+    else:
+        collect_output = stdout.append
+        collect_stderr = stderr.append
+
+    def decoded(values: Any) -> Any:
+        if mode == "text" or not encoding or isinstance(values, OutputBuffer):
+            return values
+        return _decode(values, mode, encoding)
 
     try:
         result = await execute(
-            *args, stderr_cb=collect_stderr, stdout_cb=collect_output, **kwargs
+            *args,
+            stderr_cb=collect_stderr,
+            stdout_cb=collect_output,
+            mode=mode,
+            **kwargs,
         )
-        result.stderr = stderr
-        result.stdout = stdout
+        result.stderr = decoded(stderr)
+        result.stdout = decoded(stdout)
     except BoostExecutionError as error:
-        error.process.stderr = stderr if stderr else error.process.stderr
-        error.process.stdout = stdout if stdout else error.process.stdout
+        error.process.stderr = decoded(stderr) if stderr else error.process.stderr
+        error.process.stdout = decoded(stdout) if stdout else error.process.stdout
         raise error
 
     return result
+
+
+def _decode(values: list[bytes], mode: OutputMode, encoding: str) -> list[str]:
+    if not values:
+        return []
+    if mode == "chunks":
+        return str(b"".join(values), encoding).splitlines()
+    return str(b"\n".join(values), encoding).split("\n")
+
+
+class OutputStream:
+    def __init__(
+            self,
+            *args: str,
+            maxsize: int = DEFAULT_STREAM_QUEUE,
+            combined: bool = False,
+            **kwargs: Any,
+    ) -> None:
+        self.args = args
+        self.maxsize = maxsize
+        self.combined = combined
+        self.kwargs = kwargs
+        self.stderr: list[Any] = []
+        self.result: Optional[CompletedProcess] = None
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.result.returncode if self.result else None
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._lines()
+
+    async def _lines(self) -> AsyncIterator[Any]:
+        queue: asyncio.Queue[Any] = asyncio.Queue(self.maxsize)
+        done = object()
+        batched = self.kwargs.get("mode") == "lines"
+
+        if self.combined:
+            collect_stderr = queue.put
+        elif batched:
+            collect_stderr = self.stderr.extend
+        else:
+            collect_stderr = self.stderr.append
+
+        async def produce() -> CompletedProcess:
+            try:
+                result = await execute(
+                    *self.args,
+                    stdout_cb=queue.put,
+                    stderr_cb=collect_stderr,
+                    **self.kwargs,
+                )
+            except asyncio.CancelledError:
+                raise
+            except BaseException:
+                await queue.put(done)
+                raise
+
+            await queue.put(done)
+            return result
+
+        producer = asyncio.create_task(produce())
+
+        try:
+            while True:
+                item = await queue.get()
+
+                if item is done:
+                    break
+
+                if batched:
+                    for line in item:
+                        yield line
+                else:
+                    yield item
+
+            try:
+                self.result = await producer
+            except BoostExecutionError as error:
+                if self.stderr:
+                    error.process.stderr = self.stderr
+                raise error
+
+            self.result.stderr = self.stderr
+        finally:
+            if not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+
+
+def stream(*args: str, **kwargs: Any) -> OutputStream:
+    return OutputStream(*args, **kwargs)
@@ -0,0 +1,105 @@
+import json
+import random
+
+import pytest
+
+from boost.core.json_stream import JSONArrayParser, NDJSONParser, SARIF_RESULTS
+
+SARIF = {
+    "version": 2.1,
+    "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+    "runs": [
+        {
+            "tool": {"driver": {"name": "scanner", "version": 1e3}},
+            "results": [
+                {
+                    "ruleId": f"CKV_{index}",
+                    "level": "warning",
+                    "rank": index * 2.5,
+                    "weight": -index,
+                    "score": 1.25e-3 * index,
+                    "suppressed": index % 2 == 0,
+                    "message": {"text": f"finding {index} é中 \\ \"quoted\""},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {"uri": f"aws/file{index}.tf"},
+                                "region": {"startLine": index + 1},
+                            }
+                        }
+                    ],
+                }
+                for index in range(40)
+            ],
+        },
+        {"tool": {"driver": {"name": "empty"}}, "results": []},
+        {"results": [0, -0.5, 12345678901234567890, None, "text", [1.5e10]]},
+    ],
+}
+
+
+def parse(chunks, path=()):
+    parser = JSONArrayParser(path)
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    return items + parser.close()
+
+
+def random_chunks(data, rng, max_size):
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = start + rng.randint(1, max_size)
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def expected_results(document):
+    return [result for run in document["runs"] for result in run["results"]]
+
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("indent", [None, 2])
+def test_sarif_results_under_random_chunking(seed, indent):
+    data = json.dumps(SARIF, indent=indent, ensure_ascii=False).encode("utf-8")
+    rng = random.Random(seed)
+
+    chunks = random_chunks(data, rng, rng.choice([1, 3, 16, 200]))
+
+    assert parse(chunks, SARIF_RESULTS) == expected_results(SARIF)
+
+
+@pytest.mark.parametrize(
+    "chunks, expected",
+    [
+        ([b"[2.", b"5]"], [2.5]),
+        ([b"[1e", b"3]"], [1e3]),
+        ([b"[1E+", b"3, -", b"4]"], [1e3, -4]),
+        ([b"[12", b"3]"], [123]),
+        ([b"[tr", b"ue, nu", b"ll]"], [True, None]),
+    ],
+)
+def test_values_cut_at_a_chunk_boundary(chunks, expected):
+    assert parse(chunks) == expected
+
+
+def test_skipped_number_cut_at_a_chunk_boundary():
+    chunks = [b'{"version": 2.', b'1, "runs": [{"results": [{"a": 1}]}]}']
+
+    assert parse(chunks, SARIF_RESULTS) == [{"a": 1}]
+
+
+def test_truncated_document():
+    parser = JSONArrayParser(SARIF_RESULTS)
+    parser.feed(b'{"runs": [{"results": [1, 2')
+
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_ndjson_skips_blank_lines():
+    parser = NDJSONParser()
+
+    assert parser.feed([b'{"a": 1}', b"", b"  ", b"[2.5]"]) == [{"a": 1}, [2.5]]
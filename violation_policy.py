@@ -0,0 +1,211 @@
+"""
+Compiled violation policies from `sectool-config.json` files.
+
+A config holds a `violation-policy` list of `{"rules": {rule id: action}}`
+entries.  `load_policy()` merges any number of configs into a frozen `Policy`:
+
+- a rule id ending in "*" ("aws-*", "gcp-k8s-*", "*") is a prefix rule,
+  looked up through a character trie; an exact rule beats any prefix rule and
+  a longer prefix beats a shorter one;
+- when entries disagree on the same rule id, the stricter action wins
+  ("block" over "alert"), so the result does not depend on file order; the
+  disagreements are kept in `Policy.conflicts`.
+
+`Policy.classify()` maps a batch of rule ids to actions, resolving each
+distinct id once.  With a `cache_dir`, the merged rules are stored on disk
+and reused while the sources keep their mtime and size, or failing that,
+their content hash.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, Optional, Union
+
+from boost.core.cache_files import atomic_write
+
+__all__ = [
+    "Policy",
+    "load_policy",
+]
+
+
+# Least to most strict.
+ACTIONS = ("alert", "block")
+
+SEVERITY = {action: level for level, action in enumerate(ACTIONS)}
+
+WILDCARD = "*"
+
+# Bumped when the cached representation changes.
+CACHE_VERSION = 1
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+class Policy:
+    def __init__(
+            self,
+            rules: Mapping[str, str],
+            conflicts: Mapping[str, Iterable[str]] = MappingProxyType({}),
+    ) -> None:
+        exact: dict[str, str] = {}
+        # Trie nodes map a character to the next node, and None to the action
+        # of the prefix ending there.
+        trie: dict[Any, Any] = {}
+
+        for rule_id, action in rules.items():
+            if action not in SEVERITY:
+                raise ValueError(f"unknown action '{action}' for rule '{rule_id}'")
+
+            if rule_id.endswith(WILDCARD):
+                node = trie
+                for char in rule_id[:-1]:
+                    node = node.setdefault(char, {})
+                node[None] = action
+            elif WILDCARD in rule_id:
+                raise ValueError(f"'{rule_id}': wildcards are only supported at the end")
+            else:
+                exact[rule_id] = action
+
+        self.rules = MappingProxyType(dict(rules))
+        self.conflicts = MappingProxyType(
+            {rule_id: tuple(actions) for rule_id, actions in conflicts.items()}
+        )
+        self._exact = exact
+        self._trie = trie
+        self._memo: dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def action(self, rule_id: str, default: Optional[str] = None) -> Optional[str]:
+        try:
+            action = self._memo[rule_id]
+        except KeyError:
+            action = self._memo[rule_id] = self._lookup(rule_id)
+
+        return default if action is None else action
+
+    def classify(
+            self,
+            rule_ids: Iterable[str],
+            default: Optional[str] = None,
+    ) -> list[Optional[str]]:
+        memo = self._memo
+        lookup = self._lookup
+
+        # Findings repeat a few hundred rule ids at most: resolve every
+        # distinct id once, then map the batch through the memo.
+        rule_ids = list(rule_ids)
+        for rule_id in set(rule_ids).difference(memo):
+            memo[rule_id] = lookup(rule_id)
+
+        if default is None:
+            return list(map(memo.__getitem__, rule_ids))
+
+        return [
+            default if action is None else action
+            for action in map(memo.__getitem__, rule_ids)
+        ]
+
+    def _lookup(self, rule_id: str) -> Optional[str]:
+        action = self._exact.get(rule_id)
+
+        if action is not None:
+            return action
+
+        node = self._trie
+        action = node.get(None)
+
+        for char in rule_id:
+            node = node.get(char)
+            if node is None:
+                break
+            action = node.get(None, action)
+
+        return action
+
+
+def merge(
+        documents: Iterable[Mapping[str, Any]],
+) -> tuple[dict[str, str], dict[str, tuple[str, ...]]]:
+    rules: dict[str, str] = {}
+    conflicts: dict[str, set[str]] = {}
+
+    for document in documents:
+        for entry in document.get("violation-policy", []):
+            for rule_id, action in entry.get("rules", {}).items():
+                if action not in SEVERITY:
+                    raise ValueError(f"unknown action '{action}' for rule '{rule_id}'")
+
+                current = rules.get(rule_id)
+
+                if current is not None and current != action:
+                    conflicts.setdefault(rule_id, {current}).add(action)
+
+                if current is None or SEVERITY[action] > SEVERITY[current]:
+                    rules[rule_id] = action
+
+    return rules, {
+        rule_id: tuple(sorted(actions, key=SEVERITY.__getitem__))
+        for rule_id, actions in conflicts.items()
+    }
+
+
+def _stat(path: Path) -> list[int]:
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_policy(*paths: StrPath, cache_dir: Optional[StrPath] = None) -> Policy:
+    sources = [Path(path).resolve() for path in paths]
+
+    if cache_dir is None:
+        documents = [json.loads(path.read_bytes()) for path in sources]
+        return Policy(*merge(documents))
+
+    names = "\0".join(map(str, sources)).encode("utf-8")
+    cache = Path(cache_dir) / f"policy-{_digest(names)[:32]}.json"
+    stats = [_stat(path) for path in sources]
+
+    try:
+        entry = json.loads(cache.read_bytes())
+        if entry["version"] != CACHE_VERSION:
+            entry = None
+    except (FileNotFoundError, ValueError, KeyError):
+        entry = None
+
+    if entry and entry["stats"] == stats:
+        return Policy(entry["rules"], entry["conflicts"])
+
+    contents = [path.read_bytes() for path in sources]
+    hashes = [_digest(data) for data in contents]
+
+    if entry and entry["hashes"] == hashes:
+        # Touched but unchanged: refresh the stats, keep the compiled rules.
+        rules, conflicts = entry["rules"], entry["conflicts"]
+    else:
+        rules, conflicts = merge(json.loads(data) for data in contents)
+
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(
+        cache,
+        json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "stats": stats,
+                "hashes": hashes,
+                "rules": rules,
+                "conflicts": conflicts,
+            }
+        ).encode("utf-8"),
+    )
+
+    return Policy(rules, conflicts)
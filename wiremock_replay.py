@@ -0,0 +1,373 @@
+"""
+In-process replay of recorded WireMock mappings.
+
+Tests that only replay recordings do not need the WireMock container.
+`MappingIndex` loads the `mappings` recorded by `pr_comment.py` (a recording
+result, a mappings list, a WireMock `mappings/` directory or a compacted
+`mapping_store` file) and indexes them
+on method and URL, so a request is matched by one dict lookup followed by the
+header and body checks of the few mappings recorded for that URL; only
+`urlPattern`/`urlPathPattern` mappings are scanned.  Replies are served either
+through `ReplayAdapter`, a requests transport adapter that never opens a
+socket, or by `ReplayServer` on a local port for clients outside the process.
+
+    index = MappingIndex.load("test_data/mappings")
+    session.mount(server_url, ReplayAdapter(index))
+
+As in WireMock, the lowest `priority` wins, then the most recently recorded
+mapping.  Stateful scenarios are not supported.
+"""
+
+import base64
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from mapping_store import read_mappings
+
+__all__ = [
+    "MappingIndex",
+    "ReplayAdapter",
+    "ReplayServer",
+]
+
+
+DEFAULT_PRIORITY = 5
+
+NOT_FOUND = {
+    "status": 404,
+    "body": "No response could be served as there are no stub mappings in this "
+            "WireMock instance matching the request.",
+}
+
+StrPath = Union[str, "os.PathLike[str]"]
+
+
+def _matches(pattern: Mapping[str, Any], value: Optional[str]) -> bool:
+    if "absent" in pattern:
+        return (value is None) == bool(pattern["absent"])
+    if value is None:
+        return False
+    if "equalTo" in pattern:
+        if pattern.get("caseInsensitive"):
+            return value.lower() == pattern["equalTo"].lower()
+        return value == pattern["equalTo"]
+    if "contains" in pattern:
+        return pattern["contains"] in value
+    if "matches" in pattern:
+        return re.fullmatch(pattern["matches"], value, re.DOTALL) is not None
+    if "doesNotMatch" in pattern:
+        return re.fullmatch(pattern["doesNotMatch"], value, re.DOTALL) is None
+    if "equalToJson" in pattern:
+        try:
+            return _json_matches(
+                _parse(pattern["equalToJson"]),
+                json.loads(value),
+                pattern.get("ignoreExtraElements", False),
+                pattern.get("ignoreArrayOrder", False),
+            )
+        except ValueError:
+            return False
+    return True
+
+
+def _parse(value: Any) -> Any:
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _json_matches(expected: Any, actual: Any, extra: bool, unordered: bool) -> bool:
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return False
+        if not extra and expected.keys() != actual.keys():
+            return False
+        return all(
+            key in actual and _json_matches(value, actual[key], extra, unordered)
+            for key, value in expected.items()
+        )
+
+    if isinstance(expected, list):
+        if not isinstance(actual, list) or len(expected) != len(actual):
+            return False
+        if not unordered:
+            return all(
+                _json_matches(e, a, extra, unordered) for e, a in zip(expected, actual)
+            )
+        remaining = list(actual)
+        for element in expected:
+            for i, candidate in enumerate(remaining):
+                if _json_matches(element, candidate, extra, unordered):
+                    del remaining[i]
+                    break
+            else:
+                return False
+        return True
+
+    return bool(expected == actual)
+
+
+class Stub:
+    __slots__ = ("order", "priority", "request", "response", "url_regex")
+
+    def __init__(self, order: int, mapping: Mapping[str, Any]) -> None:
+        self.order = order
+        self.priority = mapping.get("priority", DEFAULT_PRIORITY)
+        self.request = mapping.get("request", {})
+        self.response = mapping.get("response", {})
+        pattern = self.request.get("urlPattern") or self.request.get("urlPathPattern")
+        self.url_regex = re.compile(pattern) if pattern else None
+
+    @property
+    def rank(self) -> tuple[int, int]:
+        return self.priority, -self.order
+
+    def accepts(
+            self,
+            url: str,
+            path: str,
+            headers: Mapping[str, str],
+            body: Optional[str],
+    ) -> bool:
+        request = self.request
+
+        if self.url_regex is not None:
+            target = url if "urlPattern" in request else path
+            if not self.url_regex.fullmatch(target):
+                return False
+
+        for name, pattern in request.get("headers", {}).items():
+            if not _matches(pattern, headers.get(name)):
+                return False
+
+        for pattern in request.get("bodyPatterns", ()):
+            if not _matches(pattern, body or ""):
+                return False
+
+        return True
+
+
+class MappingIndex:
+    def __init__(self, mappings: Iterable[Mapping[str, Any]] = ()) -> None:
+        # (method, url) for "url" and (method, path) for "urlPath" mappings,
+        # method "ANY" matching every method.
+        self._urls: dict[tuple[str, str], list[Stub]] = {}
+        self._paths: dict[tuple[str, str], list[Stub]] = {}
+        self._patterns: list[Stub] = []
+        self._count = 0
+        self.extend(mappings)
+
+    @classmethod
+    def load(cls, source: Union[StrPath, Mapping[str, Any]]) -> "MappingIndex":
+        if isinstance(source, Mapping):
+            return cls(source.get("mappings", [source]))
+
+        path = Path(source)
+        files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+        index = cls()
+
+        for file in files:
+            if file.name.endswith((".jsonl", ".jsonl.gz")):
+                index.extend(read_mappings(file))
+                continue
+
+            document = json.loads(file.read_bytes())
+            if isinstance(document, list):
+                index.extend(document)
+            else:
+                index.extend(document.get("mappings", [document]))
+
+        return index
+
+    def __len__(self) -> int:
+        return self._count
+
+    def extend(self, mappings: Iterable[Mapping[str, Any]]) -> None:
+        for mapping in mappings:
+            stub = Stub(self._count, mapping)
+            self._count += 1
+            request = stub.request
+            method = request.get("method", "ANY")
+
+            if "url" in request:
+                self._urls.setdefault((method, request["url"]), []).append(stub)
+            elif "urlPath" in request:
+                self._paths.setdefault((method, request["urlPath"]), []).append(stub)
+            else:
+                # urlPattern, urlPathPattern, or no URL at all (matches any).
+                self._patterns.append(stub)
+
+    def match(
+            self,
+            method: str,
+            url: str,
+            headers: Mapping[str, str],
+            body: Optional[str] = None,
+    ) -> Optional[Mapping[str, Any]]:
+        # `url` is the path plus query string, as WireMock's "url" matches it.
+        path = url.split("?", 1)[0]
+        best: Optional[Stub] = None
+
+        for candidates in (
+                self._urls.get((method, url)),
+                self._urls.get(("ANY", url)),
+                self._paths.get((method, path)),
+                self._paths.get(("ANY", path)),
+                self._patterns,
+        ):
+            for stub in candidates or ():
+                if best is not None and stub.rank >= best.rank:
+                    continue
+                if stub.request.get("method", "ANY") not in (method, "ANY"):
+                    continue
+                if stub.accepts(url, path, headers, body):
+                    best = stub
+
+        return best.response if best else None
+
+    def respond(
+            self,
+            method: str,
+            url: str,
+            headers: Mapping[str, str],
+            body: Optional[str] = None,
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        response = self.match(method, url, headers, body) or NOT_FOUND
+        return _render(response)
+
+
+def _render(response: Mapping[str, Any]) -> tuple[int, list[tuple[str, str]], bytes]:
+    if "base64Body" in response:
+        content = base64.b64decode(response["base64Body"])
+    elif "jsonBody" in response:
+        content = json.dumps(response["jsonBody"]).encode("utf-8")
+    else:
+        content = str(response.get("body", "")).encode("utf-8")
+
+    headers = []
+    for name, value in response.get("headers", {}).items():
+        for item in value if isinstance(value, list) else [value]:
+            headers.append((name, str(item)))
+
+    return response.get("status", 200), headers, content
+
+
+def _request_target(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.path or '/'}?{parts.query}" if parts.query else parts.path or "/"
+
+
+def _text(body: Any) -> Optional[str]:
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        return str(body, "utf-8", errors="replace")
+    return str(body)
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, index: MappingIndex) -> None:
+        super().__init__()
+        self.index = index
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        status, headers, content = self.index.respond(
+            request.method or "GET",
+            _request_target(request.url or "/"),
+            request.headers,
+            _text(request.body),
+        )
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict()
+        for name, value in headers:
+            # Repeated headers fold into one value, as urllib3 does.
+            if name in response.headers:
+                response.headers[name] += f", {value}"
+            else:
+                response.headers[name] = value
+        response._content = content
+        response.url = request.url or ""
+        response.request = request
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+class ReplayServer:
+    def __init__(self, index: MappingIndex, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.index = index
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        index = self.index
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def handle_one_request(self) -> None:
+                # Every method goes through reply(), without a do_* method each.
+                self.raw_requestline = self.rfile.readline(65537)
+                if not self.raw_requestline:
+                    self.close_connection = True
+                    return
+                if self.parse_request():
+                    self.reply()
+                    self.wfile.flush()
+
+            def reply(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else None
+                status, headers, content = index.respond(
+                    self.command,
+                    self.path,
+                    CaseInsensitiveDict(self.headers.items()),
+                    _text(body),
+                )
+                self.send_response(status)
+                for name, value in headers:
+                    if name.lower() not in ("content-length", "transfer-encoding", "content-encoding"):
+                        self.send_header(name, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
@@ -0,0 +1,242 @@
+"""
+Long-lived worker processes for tools that are invoked many times.
+
+Instead of paying fork/exec and interpreter startup on every call, a
+`WorkerPool` keeps a few copies of the tool running and sends each request
+over the worker's stdin.  Frames are a 4-byte big-endian length followed by a
+JSON payload:
+
+    request:  {"args": [...], "stdin": "..."}
+    response: {"returncode": 0, "stdout": [...], "stderr": [...]}
+
+Python tools can speak the protocol with `serve()`.  Calls keep the error
+semantics of `execute`: non-zero exits raise `BoostExecutionError` when
+checked, and timeouts raise `BoostRuntimeError` after killing the worker.
+"""
+
+import asyncio
+import json
+import logging
+import struct
+import sys
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional
+
+from boost.core.errors import BoostExecutionError, BoostRuntimeError
+from boost.core.globals import BOOST_EXEC_DEFAULT_TIMEOUT
+from boost.core.subprocess import CompletedProcess, default_concurrency
+
+__all__ = [
+    "WorkerPool",
+    "serve",
+]
+
+
+logger = logging.getLogger("boost.command.worker")
+error_logger = logging.getLogger("boost.command.stderr")
+
+HEADER = struct.Struct(">I")
+
+DEFAULT_MAX_JOBS = 1000
+
+
+class Worker:
+    def __init__(self, process: asyncio.subprocess.Process) -> None:
+        self.process = process
+        self.jobs = 0
+        self.stderr = asyncio.create_task(self._log_stderr())
+
+    async def call(self, request: dict[str, Any]) -> dict[str, Any]:
+        assert self.process.stdin and self.process.stdout
+        payload = json.dumps(request).encode("utf-8")
+        self.process.stdin.write(HEADER.pack(len(payload)) + payload)
+        await self.process.stdin.drain()
+
+        header = await self.process.stdout.readexactly(HEADER.size)
+        (size,) = HEADER.unpack(header)
+        response = await self.process.stdout.readexactly(size)
+
+        self.jobs += 1
+        return json.loads(response)
+
+    def rss(self) -> Optional[int]:
+        try:
+            status = Path(f"/proc/{self.process.pid}/status").read_text()
+        except OSError:
+            return None
+
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+        return None
+
+    async def stop(self) -> None:
+        if self.process.returncode is None:
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        await self.process.wait()
+        await self.stderr
+
+    async def _log_stderr(self) -> None:
+        assert self.process.stderr
+        async for line in self.process.stderr:
+            error_logger.debug(str(line, "utf-8", errors="replace").rstrip())
+
+
+class WorkerPool:
+    def __init__(
+            self,
+            command: str,
+            *args: str,
+            size: Optional[int] = None,
+            max_jobs: int = DEFAULT_MAX_JOBS,
+            max_rss: Optional[int] = None,
+            timeout: Optional[float] = BOOST_EXEC_DEFAULT_TIMEOUT,
+            **kwargs: Any,
+    ) -> None:
+        self.command = command
+        self.args = args
+        self.size = size or default_concurrency()
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self._idle: Optional[asyncio.Queue[Optional[Worker]]] = None
+        self._workers: set[Worker] = set()
+
+    async def __aenter__(self) -> "WorkerPool":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @property
+    def idle(self) -> asyncio.Queue[Optional[Worker]]:
+        # None is a slot that may spawn a new worker on demand.
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                self._idle.put_nowait(None)
+        return self._idle
+
+    async def run(
+            self,
+            *args: str,
+            stdin: Optional[str] = None,
+            check: Optional[bool] = True,
+            timeout: Optional[float] = None,
+    ) -> CompletedProcess:
+        timeout = self.timeout if timeout is None else timeout
+        result = CompletedProcess(self.command, args, -1)
+        worker = await self.idle.get()
+
+        try:
+            if worker is None:
+                worker = await self._spawn(result)
+
+            response = await asyncio.wait_for(
+                worker.call({"args": list(args), "stdin": stdin}),
+                timeout=timeout,
+            )
+        except asyncio.exceptions.TimeoutError as e:
+            await self._retire(worker)
+            worker = None
+            command = Path(self.command).name
+            raise BoostRuntimeError(
+                f"command '{command}' timed out after {timeout} seconds",
+            ) from e
+        except (asyncio.IncompleteReadError, ConnectionResetError) as e:
+            if worker:
+                await self._retire(worker)
+                result.returncode = worker.process.returncode
+            worker = None
+            raise BoostExecutionError(
+                f"worker '{self.command}' exited while handling a request",
+                process=result,
+            ) from e
+        except BaseException:
+            if worker:
+                await self._retire(worker)
+            worker = None
+            raise
+        finally:
+            await self._release(worker)
+
+        result.returncode = response["returncode"]
+        result.stdout = response.get("stdout", [])
+        result.stderr = response.get("stderr", [])
+
+        if check and result.returncode != 0:
+            raise BoostExecutionError(
+                f"command '{self.command} {args}' exited with non-zero "
+                f"({result.returncode}) exit status",
+                process=result,
+            )
+
+        return result
+
+    async def close(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in list(self._workers)))
+        self._workers.clear()
+        self._idle = None
+
+    async def _spawn(self, result: CompletedProcess) -> Worker:
+        logger.debug(f"{self.command}, {' '.join(self.args)}")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                self.command,
+                *self.args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                **self.kwargs,
+            )
+        except FileNotFoundError as e:
+            result.returncode = 127
+            result.stderr = [f"command '{self.command}' failed, executable not found"]
+            raise BoostExecutionError(
+                f"command '{self.command}' failed, executable not found",
+                process=result,
+            ) from e
+
+        worker = Worker(process)
+        self._workers.add(worker)
+        return worker
+
+    async def _release(self, worker: Optional[Worker]) -> None:
+        if worker and (
+                worker.jobs >= self.max_jobs
+                or (self.max_rss and (worker.rss() or 0) > self.max_rss)
+        ):
+            logger.debug(f"recycling worker {worker.process.pid}")
+            await self._retire(worker)
+            worker = None
+
+        self.idle.put_nowait(worker)
+
+    async def _retire(self, worker: Worker) -> None:
+        self._workers.discard(worker)
+        await worker.stop()
+
+
+def serve(
+        handler: Callable[[list[str], Optional[str]], CompletedProcess],
+        stdin: BinaryIO = sys.stdin.buffer,
+        stdout: BinaryIO = sys.stdout.buffer,
+) -> None:
+    while header := stdin.read(HEADER.size):
+        (size,) = HEADER.unpack(header)
+        request = json.loads(stdin.read(size))
+        result = handler(request["args"], request.get("stdin"))
+        payload = json.dumps(
+            {
+                "returncode": result.returncode,
+                "stdout": list(result.stdout),
+                "stderr": list(result.stderr),
+            }
+        ).encode("utf-8")
+        stdout.write(HEADER.pack(len(payload)) + payload)
+        stdout.flush()